@@ -1,91 +1,247 @@
 """iDRAC power usage monitor"""
 import asyncio
 import logging
+import shutil
+from functools import partial
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
-
-from .const import DOMAIN, DATA_IDRAC_REST_CLIENT, HOST, USERNAME, PASSWORD, CONF_INTERVAL, CONF_INTERVAL_DEFAULT
-from .idrac_rest import IdracMock, IdracRest
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.requirements import async_process_requirements
+
+from .aggregate import PowerAggregator, aggregate_source
+from .capabilities import apply_capabilities
+from .const import (DOMAIN, DATA_IDRAC_REST_CLIENT, DATA_IDRAC_EXECUTOR, DATA_IDRAC_POLLER, DATA_AGGREGATOR,
+                    DATA_ALIGNED_POLLS, ALIGNED_MAX_CONCURRENT_POLLS, HOST, USERNAME, PASSWORD, CONF_GROUP,
+                    CONF_INTERVAL, CONF_INTERVAL_DEFAULT, CONF_WORKERS, CONF_WORKERS_DEFAULT, CONF_RATE_LIMIT,
+                    CONF_RATE_LIMIT_DEFAULT, CONF_RATE_BURST, CONF_RATE_BURST_DEFAULT, CONF_TIMESERIES,
+                    DATA_TIMESERIES, DATA_SETUP_TIMINGS, CONF_CAPABILITIES, CONF_IPMI, CONF_IPMI_PORT,
+                    CONF_IPMI_PORT_DEFAULT, DATA_REGISTRY, DATA_CONNECTION, CONF_ADAPTIVE, CONF_INTERVAL_MAX,
+                    CONF_INTERVAL_MAX_DEFAULT)
+from .eventlog import log_store
+from .executor import IdracExecutor, PRIORITY_POLL
+from .idrac_rest import IdracMock, IdracRest, is_mock_host
+from .poller import IdracPoller, PLAN_OFF
+from .registry import IdracConnection, IdracRegistry, connection_key, same_bmc
+from .services import async_setup_services
+from .timing import SetupTimings
 
 _LOGGER = logging.getLogger(__name__)
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the services and the aggregates of the iDRAC integration."""
+    aggregator = PowerAggregator()
+    aggregator.async_start(hass)
+    hass.data.setdefault(DOMAIN, {})[DATA_AGGREGATOR] = aggregator
+    hass.data[DOMAIN][DATA_ALIGNED_POLLS] = asyncio.Semaphore(ALIGNED_MAX_CONCURRENT_POLLS)
+    hass.data[DOMAIN][DATA_REGISTRY] = IdracRegistry()
+
+    async_setup_services(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up the iDRAC connection from a config entry."""
+    timings = SetupTimings()
+
+    registry: IdracRegistry = hass.data[DOMAIN][DATA_REGISTRY]
+    # Entries of a BMC which already has a connection share it, instead of polling it twice
+    connection = registry.get(entry.data[HOST], entry.unique_id)
+    shared = connection is not None
+    if shared:
+        _LOGGER.info(f"{entry.title} shares the connection to {entry.data[HOST]} of another entry")
+    else:
+        with timings.phase('client'):
+            connection = await _async_create_connection(hass, entry)
+    registry.add(entry.entry_id, entry.data[HOST], connection)
+
+    hass.data[DOMAIN][entry.entry_id] = {
+        DATA_IDRAC_REST_CLIENT: connection.rest,
+        DATA_IDRAC_EXECUTOR: connection.executor,
+        DATA_IDRAC_POLLER: connection.poller,
+        DATA_CONNECTION: connection,
+        DATA_SETUP_TIMINGS: timings,
+    }
 
-    if entry.data[HOST] == 'MOCK':
-        rest_client = IdracMock(
-            entry.data[HOST],
-            entry.data[USERNAME],
-            entry.data[PASSWORD],
-            entry.data.get(CONF_INTERVAL, CONF_INTERVAL_DEFAULT)
+    if not shared:
+        try:
+            await _async_connect(hass, entry, connection, timings)
+        except Exception:
+            registry.release(entry.entry_id)
+            connection.executor.shutdown()
+            raise
+    if connection.stores:
+        hass.data[DOMAIN][entry.entry_id][DATA_TIMESERIES] = connection.stores
+
+    # Each platform's own setup is timed as platform_<name> within this phase
+    with timings.phase('platforms'):
+        await hass.config_entries.async_forward_entry_setups(
+            entry, [Platform.SENSOR, Platform.BINARY_SENSOR, Platform.BUTTON, Platform.SWITCH]
         )
+
+    if not shared:
+        connection.poller.async_start()
+
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+    return True
+
+
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload an entry whose settings were changed through its options, so they take effect.
+
+    The entries sharing its connection are reloaded along with it, as the connection is only created
+    again once none of them uses it, and then with the settings of this entry.
+    """
+    connection = hass.data[DOMAIN][entry.entry_id][DATA_CONNECTION]
+    entry_ids = [entry.entry_id] + [entry_id for entry_id in connection.entry_ids if entry_id != entry.entry_id]
+    for entry_id in entry_ids:
+        await hass.config_entries.async_unload(entry_id)
+    for entry_id in entry_ids:
+        await hass.config_entries.async_setup(entry_id)
+
+
+async def _async_create_connection(hass: HomeAssistant, entry: ConfigEntry) -> IdracConnection:
+    interval = entry.data.get(CONF_INTERVAL, CONF_INTERVAL_DEFAULT)
+    if entry.data.get(CONF_ADAPTIVE):
+        # Polled readings can be this far apart, so they only get stale after that
+        interval = max(interval, entry.data.get(CONF_INTERVAL_MAX, CONF_INTERVAL_MAX_DEFAULT))
+
+    if is_mock_host(entry.data[HOST]):
+        rest_client = IdracMock(entry.data[HOST], entry.data[USERNAME], entry.data[PASSWORD], interval)
     else:
-        rest_client = IdracRest(
-            entry.data[HOST],
-            entry.data[USERNAME],
-            entry.data[PASSWORD],
-            entry.data.get(CONF_INTERVAL, CONF_INTERVAL_DEFAULT)
+        rest_client = IdracRest(entry.data[HOST], entry.data[USERNAME], entry.data[PASSWORD], interval)
+
+    rest_client.configure_rate_limit(
+        entry.data.get(CONF_RATE_LIMIT, CONF_RATE_LIMIT_DEFAULT),
+        entry.data.get(CONF_RATE_BURST, CONF_RATE_BURST_DEFAULT)
+    )
+
+    if entry.data.get(CONF_IPMI) and await _async_install_ipmi(hass, entry):
+        await hass.async_add_executor_job(
+            rest_client.configure_ipmi, entry.data.get(CONF_IPMI_PORT, CONF_IPMI_PORT_DEFAULT)
         )
 
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
-        DATA_IDRAC_REST_CLIENT: rest_client
-    }
+    executor = IdracExecutor(entry.data.get(CONF_WORKERS, CONF_WORKERS_DEFAULT), f"idrac_{entry.data[HOST]}")
+    return IdracConnection(rest_client, executor, IdracPoller(hass, entry, rest_client, executor), entry.unique_id)
 
-    # Detect firmware version to configure client capabilities
+
+async def _async_install_ipmi(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Install pyghmi for an entry which uses IPMI, whether it's available; without it Redfish reads everything."""
+    if is_mock_host(entry.data[HOST]):
+        # The simulated fleet answers the IPMI commands itself
+        return True
+
+    from .ipmi import REQUIREMENTS
     try:
-        firmware_version = await hass.async_add_executor_job(rest_client.get_firmware_version)
-        if firmware_version:
-            rest_client.configure_firmware(firmware_version)
-    except Exception as e:
-        _LOGGER.warning(f"Could not detect firmware version for {entry.entry_id}: {e}")
+        await async_process_requirements(hass, DOMAIN, REQUIREMENTS)
+    except HomeAssistantError as e:
+        _LOGGER.warning(f"Could not install {', '.join(REQUIREMENTS)} for IPMI on {entry.data[HOST]}, "
+                        f"only using Redfish: {e}")
+        return False
+    return True
 
-    await hass.config_entries.async_forward_entry_setups(
-        entry, [Platform.SENSOR, Platform.BINARY_SENSOR, Platform.BUTTON, Platform.SWITCH]
-    )
 
-    async def refresh_sensors_task():
-        while True:
-            _LOGGER.debug("Refreshing sensors")
-            await update_all()
-            await asyncio.sleep(rest_client.interval)
+async def _async_connect(hass: HomeAssistant, entry: ConfigEntry, connection: IdracConnection,
+                         timings: SetupTimings) -> None:
+    """Configure a new connection for its iDRAC, and start feeding the aggregates and stores."""
+    rest_client, executor = connection.rest, connection.executor
 
-    async def update_all():
-        try:
-            await hass.async_add_executor_job(rest_client.update_thermals)
-        except Exception as e:
-            # ignore exceptions, just log the error
-            _LOGGER.warning(f"Updating {entry.entry_id} thermals sensors failed:\n{e}")
+    # The capabilities probed when the entry was added, entries added before that have none
+    capabilities = entry.data.get(CONF_CAPABILITIES, {})
 
+    # Detect firmware version to configure client capabilities
+    with timings.phase('firmware'):
         try:
-            await hass.async_add_executor_job(rest_client.update_status)
+            firmware_version = await executor.async_submit(PRIORITY_POLL, rest_client.get_firmware_version)
+            if firmware_version:
+                rest_client.configure_firmware(firmware_version)
         except Exception as e:
-            # ignore exceptions, just log the error
-            _LOGGER.warning(f"Updating {entry.entry_id} status sensor failed:\n{e}")
+            _LOGGER.warning(f"Could not detect firmware version for {entry.entry_id}: {e}")
+    apply_capabilities(rest_client, capabilities)
 
+    # Enclosures can hold several systems, which are all polled through this connection
+    with timings.phase('members'):
         try:
-            await hass.async_add_executor_job(rest_client.update_power_usage)
+            members = await executor.async_submit(PRIORITY_POLL, rest_client.discover_members)
+            rest_client.configure_members(members)
         except Exception as e:
-            # ignore exceptions, just log the error
-            _LOGGER.warning(f"Updating {entry.entry_id} power usage failed:\n{e}")
-
-    task = hass.async_create_background_task(refresh_sensors_task(), f"Update {entry.entry_id} iDRAC task")
-    hass.data[DOMAIN][entry.entry_id]['task'] = task
-
-    return True
+            if capabilities.get('members'):
+                _LOGGER.warning(f"Could not discover the systems of {entry.entry_id}, using the probed ones: {e}")
+                rest_client.configure_members([tuple(member) for member in capabilities['members']])
+            else:
+                _LOGGER.warning(f"Could not discover the systems of {entry.entry_id}, assuming a single one: {e}")
+
+    group = entry.data.get(CONF_GROUP)
+    if group:
+        aggregator = hass.data[DOMAIN][DATA_AGGREGATOR]
+        for member in rest_client.members:
+            source = aggregate_source(connection.key, member)
+            aggregator.add_source(source, group, partial(_stale_timeout, connection.poller, member))
+            member.register_callback_samples(partial(aggregator.update_sample, source))
+
+    if entry.data.get(CONF_TIMESERIES):
+        with timings.phase('timeseries'):
+            from .timeseries import TimeSeriesStore
+            for member in rest_client.members:
+                store = connection.stores[member.system_id] = await hass.async_add_executor_job(
+                    TimeSeriesStore, _timeseries_path(hass, connection.key, member.system_id), executor
+                )
+                member.register_callback_samples(store.add_sample)
+
+
+def _stale_timeout(poller: IdracPoller, rest: IdracRest) -> float:
+    """How long a host may go without reporting to the aggregates, 3 of its current poll intervals."""
+    if poller.poll_plan(rest) == PLAN_OFF:
+        # A powered off server only reports its standby power every interval_off
+        return 3 * max(rest.interval, poller.interval_off)
+    return 3 * rest.interval
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Unload an iDRAC config entry."""
-    hass.data[DOMAIN][entry.entry_id]['task'].cancel()
-
+    """Unload an iDRAC config entry, and close its connection if no other entry shares it."""
     unload_ok = await hass.config_entries.async_unload_platforms(
         entry, [Platform.SENSOR, Platform.BINARY_SENSOR, Platform.BUTTON, Platform.SWITCH]
     )
+    if not unload_ok:
+        return False
+
+    connection = hass.data[DOMAIN].pop(entry.entry_id)[DATA_CONNECTION]
+    if hass.data[DOMAIN][DATA_REGISTRY].release(entry.entry_id) is None:
+        if connection.poller.entry is entry and connection.entry_ids:
+            # Another entry still uses the connection, keep polling on its behalf
+            connection.poller.set_entry(hass.config_entries.async_get_entry(next(iter(connection.entry_ids))))
+        return True
+
+    connection.poller.async_stop()
+    for member in connection.rest.members:
+        hass.data[DOMAIN][DATA_AGGREGATOR].remove_source(aggregate_source(connection.key, member))
+    # The stores write their last samples on the executor
+    for store in connection.stores.values():
+        await store.async_close()
+    connection.executor.shutdown()
+    if connection.rest.ipmi is not None:
+        await hass.async_add_executor_job(connection.rest.ipmi.close)
+
+    return True
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored event log cursor and time series of a removed iDRAC, unless another entry shares them."""
+    for other in hass.config_entries.async_entries(DOMAIN):
+        if other.entry_id != entry.entry_id and same_bmc(entry.data[HOST], entry.unique_id,
+                                                         other.data[HOST], other.unique_id):
+            return
+
+    key = connection_key(entry.data[HOST], entry.unique_id)
+    await log_store(hass, key).async_remove()
+    await hass.async_add_executor_job(shutil.rmtree, _timeseries_path(hass, key), True)
 
-    if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
 
-    return unload_ok
+def _timeseries_path(hass: HomeAssistant, key: str, *system_id: str) -> str:
+    return hass.config.path('.storage', f"{DOMAIN}_timeseries", key, *system_id)
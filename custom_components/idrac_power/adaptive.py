@@ -0,0 +1,86 @@
+"""Adaptive poll intervals, which speed up while readings change and back off while they're stable."""
+from __future__ import annotations
+
+from typing import Any
+
+# What the interval of a metric is divided by when its reading changed, and multiplied by when it didn't
+SPEED_UP = 2
+BACK_OFF = 1.5
+
+
+class AdaptiveSchedule:
+    """The poll intervals of the metrics of one system, each between minimum and maximum.
+
+    A reading which moved more than the deadband, a fraction of the previous reading, halves the
+    interval of its metric. One which stayed within it makes the interval grow towards the maximum.
+    A flip of the power status makes every metric of the system poll at the minimum again, as
+    everything else is about to change too.
+    """
+
+    def __init__(self, metrics: list[str], initial: float, minimum: float, maximum: float, deadband: float,
+                 status_metric: str, now: float):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.deadband = deadband
+        self.status_metric = status_metric
+
+        initial = min(max(initial, self.minimum), self.maximum)
+        self.intervals: dict[str, float] = {metric: initial for metric in metrics}
+        self._due: dict[str, float] = {metric: now for metric in metrics}
+        self._readings: dict[str, Any] = {}
+
+    def due(self, now: float) -> set[str]:
+        """The metrics to poll now."""
+        return {metric for metric, due in self._due.items() if due <= now}
+
+    def next_due(self) -> float:
+        return min(self._due.values())
+
+    def observe(self, readings: dict[str, Any], now: float) -> None:
+        """Adapt the intervals of the metrics which were just polled to how much their readings moved."""
+        previous_readings, self._readings = self._readings, {**self._readings, **readings}
+
+        status = readings.get(self.status_metric)
+        previous_status = previous_readings.get(self.status_metric)
+        if status is not None and previous_status is not None and status != previous_status:
+            self.speed_up(now)
+            for metric in readings:
+                self._due[metric] = now + self.minimum
+            return
+
+        for metric, reading in readings.items():
+            previous = previous_readings.get(metric)
+            # Nothing to compare with, or the poll failed, which polling faster wouldn't help with
+            if previous is None or reading is None:
+                pass
+            elif _moved(previous, reading, self.deadband):
+                self.intervals[metric] = max(self.minimum, self.intervals[metric] / SPEED_UP)
+            else:
+                self.intervals[metric] = min(self.maximum, self.intervals[metric] * BACK_OFF)
+            self._due[metric] = now + self.intervals[metric]
+
+    def speed_up(self, now: float) -> None:
+        """Poll every metric at the minimum interval from now on."""
+        for metric in self.intervals:
+            self.intervals[metric] = self.minimum
+            self._due[metric] = min(self._due[metric], now + self.minimum)
+
+    def as_dict(self) -> dict[str, float]:
+        return {metric: round(interval, 1) for metric, interval in self.intervals.items()}
+
+
+def _moved(previous: Any, reading: Any, deadband: float) -> bool:
+    """Whether a reading, or any of the readings in a Redfish resource, moved outside the deadband."""
+    if isinstance(previous, bool) or isinstance(reading, bool):
+        return previous != reading
+    if isinstance(previous, (int, float)) and isinstance(reading, (int, float)):
+        return abs(reading - previous) > deadband * abs(previous)
+    if isinstance(previous, dict) and isinstance(reading, dict):
+        return previous.keys() != reading.keys() or any(
+            _moved(value, reading[key], deadband) for key, value in previous.items()
+        )
+    if isinstance(previous, list) and isinstance(reading, list):
+        return len(previous) != len(reading) or any(
+            _moved(value, new_value, deadband) for value, new_value in zip(previous, reading)
+        )
+    return previous != reading
@@ -0,0 +1,227 @@
+"""Running power, energy and inlet temperature totals over groups of iDRACs."""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .idrac_rest import SAMPLE_POWER, SAMPLE_ENERGY, SAMPLE_THERMALS
+
+_LOGGER = logging.getLogger(__name__)
+
+FLEET = 'fleet'
+EXPIRE_INTERVAL = timedelta(seconds=30)
+
+
+def aggregate_source(connection_key: str, rest) -> str:
+    """The key of a system in the aggregates, the same for every entry sharing its connection."""
+    return f"{connection_key}_{rest.system_id}"
+
+
+def inlet_temperature(thermals: dict | None) -> float | None:
+    """The highest inlet temperature of a Thermal resource."""
+    if not thermals:
+        return None
+    readings = [temp.get('ReadingCelsius') for temp in thermals.get('Temperatures', [])
+                if 'inlet' in temp.get('Name', '').lower()]
+    readings = [reading for reading in readings if reading is not None]
+    return max(readings) if readings else None
+
+
+class PowerAggregate:
+    """The totals of one group, updated in constant time per sample.
+
+    The power total is kept as a running sum. The energy total adds up the increase of every
+    host's counter, so it keeps increasing when hosts drop out or come back. The maximum inlet
+    temperature is only recomputed when the host holding it reports a lower reading or leaves.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+        self.power: int = 0
+        self.energy: float = 0
+        # Whether the energy total continues from the last one restored yet, the aggregate outlives reloads
+        self.energy_restored = False
+        self.inlet_temperature: float | None = None
+        self.sources: int = 0
+        self.sampled_at: float | None = None
+
+        self._power: dict[str, int] = {}
+        self._energy: dict[str, float] = {}
+        self._inlet: dict[str, float] = {}
+        self._inlet_source: str | None = None
+
+        self.listeners: list[Callable[[], None]] = []
+
+    def update_power(self, source: str, watts: int | None, sampled_at: float) -> None:
+        self.power += (watts or 0) - self._power.pop(source, 0)
+        if watts is not None:
+            self._power[source] = watts
+        self.sources = len(self._power)
+        self.sampled_at = sampled_at
+
+    def update_energy(self, source: str, kwh: float, sampled_at: float) -> None:
+        previous = self._energy.get(source)
+        # A lower reading means the counter was reset, count from the new value onwards
+        if previous is not None and kwh > previous:
+            self.energy += kwh - previous
+        self._energy[source] = kwh
+        self.sampled_at = sampled_at
+
+    def update_inlet_temperature(self, source: str, celsius: float | None, sampled_at: float) -> None:
+        if celsius is None:
+            self._inlet.pop(source, None)
+        else:
+            self._inlet[source] = celsius
+
+        if celsius is not None and (self.inlet_temperature is None or celsius >= self.inlet_temperature):
+            self.inlet_temperature = celsius
+            self._inlet_source = source
+        elif source == self._inlet_source:
+            self._recompute_inlet_temperature()
+        self.sampled_at = sampled_at
+
+    def remove(self, source: str) -> None:
+        """Exclude a host, its energy counter is kept to continue from when it returns."""
+        self.power -= self._power.pop(source, 0)
+        self.sources = len(self._power)
+        if self._inlet.pop(source, None) is not None and source == self._inlet_source:
+            self._recompute_inlet_temperature()
+
+    def _recompute_inlet_temperature(self) -> None:
+        if self._inlet:
+            self._inlet_source = max(self._inlet, key=self._inlet.get)
+            self.inlet_temperature = self._inlet[self._inlet_source]
+        else:
+            self._inlet_source = None
+            self.inlet_temperature = None
+
+    def notify(self) -> None:
+        for listener in self.listeners:
+            listener()
+
+
+class PowerAggregator:
+    """Feeds the samples of every host into its group's and the fleet's aggregate."""
+
+    def __init__(self):
+        self.aggregates: dict[str, PowerAggregate] = {}
+
+        self._lock = threading.Lock()
+        self._groups: dict[str, tuple[PowerAggregate, ...]] = {}
+        self._stale_timeouts: dict[str, Callable[[], float]] = {}
+        self._last_seen: dict[str, float] = {}
+        self._stale: set[str] = set()
+        # The entry which created the entities of each aggregate, and the entries of the groups which could
+        # create them instead, with their source and the function which adds the entities
+        self._owners: dict[str, str] = {}
+        self._claimants: dict[str, tuple[str, Callable[[list[PowerAggregate]], None]]] = {}
+        self._unsub_expire: Callable[[], None] | None = None
+
+    @callback
+    def async_start(self, hass: HomeAssistant) -> None:
+        self._unsub_expire = async_track_time_interval(hass, self._async_expire, EXPIRE_INTERVAL)
+
+    def add_source(self, source: str, group: str, stale_timeout: Callable[[], float]) -> None:
+        """Start aggregating a host in a group and in the fleet.
+
+        stale_timeout returns how long the host may currently go without reporting, as that depends on
+        how it's polled at the moment.
+        """
+        with self._lock:
+            self._groups[source] = tuple(
+                self.aggregates.setdefault(name, PowerAggregate(name)) for name in dict.fromkeys((group, FLEET))
+            )
+            self._stale_timeouts[source] = stale_timeout
+
+    def remove_source(self, source: str) -> None:
+        with self._lock:
+            aggregates = self._groups.pop(source, ())
+            for aggregate in aggregates:
+                aggregate.remove(source)
+            self._stale_timeouts.pop(source, None)
+            self._last_seen.pop(source, None)
+            self._stale.discard(source)
+        for aggregate in aggregates:
+            aggregate.notify()
+
+    def add_claimant(self, claimant: str, source: str, add_entities: Callable[[list[PowerAggregate]], None]) -> None:
+        """Let an entry create the entities of its source's aggregates which nobody has created yet.
+
+        It also creates the ones whose entry is unloaded later on, while it's still loaded itself.
+        """
+        with self._lock:
+            self._claimants[claimant] = (source, add_entities)
+            claimed = self._claim(claimant)
+        if claimed:
+            add_entities(claimed)
+
+    def remove_claimant(self, claimant: str) -> None:
+        """Hand the aggregates whose entities an unloaded entry created over to the entries still loaded."""
+        with self._lock:
+            self._claimants.pop(claimant, None)
+            for name, owner in list(self._owners.items()):
+                if owner == claimant:
+                    del self._owners[name]
+            handed_over = [(add_entities, self._claim(other))
+                           for other, (_, add_entities) in self._claimants.items()]
+        for add_entities, claimed in handed_over:
+            if claimed:
+                add_entities(claimed)
+
+    def _claim(self, claimant: str) -> list[PowerAggregate]:
+        source, _ = self._claimants[claimant]
+        claimed = [aggregate for aggregate in self._groups.get(source, ()) if aggregate.name not in self._owners]
+        for aggregate in claimed:
+            self._owners[aggregate.name] = claimant
+        return claimed
+
+    def update_sample(self, source: str, metric: str, value: Any, sampled_at: float) -> None:
+        """Add a reading of one of the IdracRest.callback_samples metrics."""
+        if metric == SAMPLE_POWER:
+            self._update(source, lambda aggregate: aggregate.update_power(source, value, sampled_at))
+        elif metric == SAMPLE_ENERGY:
+            self._update(source, lambda aggregate: aggregate.update_energy(source, value, sampled_at))
+        elif metric == SAMPLE_THERMALS:
+            celsius = inlet_temperature(value)
+            self._update(source, lambda aggregate: aggregate.update_inlet_temperature(source, celsius, sampled_at))
+
+    def _update(self, source: str, update: Callable[[PowerAggregate], None]) -> None:
+        with self._lock:
+            aggregates = self._groups.get(source)
+            if not aggregates:
+                return
+            self._last_seen[source] = time.time()
+            self._stale.discard(source)
+            for aggregate in aggregates:
+                update(aggregate)
+        for aggregate in aggregates:
+            aggregate.notify()
+
+    @callback
+    def _async_expire(self, _now=None) -> None:
+        """Exclude the hosts which haven't reported for longer than their timeout."""
+        now = time.time()
+        changed = set()
+        with self._lock:
+            for source, last_seen in self._last_seen.items():
+                if source not in self._stale and now - last_seen > self._stale_timeouts[source]():
+                    _LOGGER.debug(f"Excluding stale {source} from the aggregates")
+                    self._stale.add(source)
+                    for aggregate in self._groups[source]:
+                        aggregate.remove(source)
+                        changed.add(aggregate)
+        for aggregate in changed:
+            aggregate.notify()
+
+    @callback
+    def async_stop(self) -> None:
+        if self._unsub_expire is not None:
+            self._unsub_expire()
+            self._unsub_expire = None
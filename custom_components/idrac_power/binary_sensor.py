@@ -6,13 +6,11 @@ import logging
 from homeassistant.components.binary_sensor import BinarySensorEntity, BinarySensorDeviceClass, \
     BinarySensorEntityDescription
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.exceptions import PlatformNotReady
+from homeassistant.core import HomeAssistant, callback
 
-from .const import (DOMAIN, DATA_IDRAC_REST_CLIENT, JSON_MODEL, JSON_MANUFACTURER, JSON_SERIAL_NUMBER,
-                    DATA_IDRAC_FIRMWARE, DATA_IDRAC_INFO)
-from .idrac_rest import IdracRest, CannotConnect, RedfishConfig
+from .device import async_get_devices
+from .idrac_rest import IdracRest
+from .timing import timed_platform_setup
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,47 +20,14 @@ drac_chassis_path = '/redfish/v1/Chassis/System.Embedded.1'
 drac_powercontrol_path = '/redfish/v1/Chassis/System.Embedded.1/Power/PowerControl'
 
 
+@timed_platform_setup('binary_sensor')
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
     """Add iDRAC power sensor entry"""
-    rest_client = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_REST_CLIENT]
-
-    try:
-        if DATA_IDRAC_INFO not in hass.data[DOMAIN][entry.entry_id]:
-            info = await hass.async_add_executor_job(target=rest_client.get_device_info)
-            if not info:
-                raise PlatformNotReady("Could not set up: device didn't return anything.")
-
-            hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_INFO] = info
-        else:
-            info = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_INFO]
-
-        firmware_version = await hass.async_add_executor_job(target=rest_client.get_firmware_version)
-        if not firmware_version:
-            if DATA_IDRAC_FIRMWARE in hass.data[DOMAIN][entry.entry_id]:
-                firmware_version = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_FIRMWARE]
-        else:
-            hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_FIRMWARE] = firmware_version
-    except (CannotConnect, RedfishConfig) as e:
-        raise PlatformNotReady(str(e)) from e
-
-    model = info[JSON_MODEL]
-    name = model
-    manufacturer = info[JSON_MANUFACTURER]
-    serial = info[JSON_SERIAL_NUMBER]
-
-    device_info = DeviceInfo(
-        identifiers={(DOMAIN, serial)},
-        name=name,
-        manufacturer=manufacturer,
-        model=model,
-        sw_version=firmware_version,
-        serial_number=serial
-    )
-
     async_add_entities([
-        IdracStatusBinarySensor(hass, rest_client, device_info, f"{serial}_{name}_status",
-                                f"{name} status"
+        IdracStatusBinarySensor(hass, device.rest, device.device_info, f"{device.serial}_{device.name}_status",
+                                f"{device.name} status"
                                 )
+        for device in await async_get_devices(hass, entry)
     ])
 
 
@@ -84,17 +49,19 @@ class IdracStatusBinarySensor(BinarySensorEntity):
         self._attr_unique_id = unique_id
         self._attr_has_entity_name = True
 
-        self.rest.register_callback_status(self.update_value)
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self.rest.register_callback_status(self.update_value))
 
     @property
     def name(self):
         """Name of the entity."""
         return "Server Status"
 
+    @callback
     def update_value(self, status: bool | None):
         if status is not None:
             self._attr_is_on = status
             self._attr_available = True
         else:
             self._attr_available = False
-        self.schedule_update_ha_state()
+        self.async_write_ha_state()
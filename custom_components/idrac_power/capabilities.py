@@ -0,0 +1,122 @@
+"""Probing what an iDRAC supports once when it's added, so the polls never try unsupported paths."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Any
+
+from .const import JSON_POWER_METRICS, JSON_ENERGY_CONSUMED_KWH
+from .executor import IdracExecutor, PRIORITY_POLL
+from .idrac_rest import IdracRest, drac_power_path, drac_sel_entries_path, power_control
+
+_LOGGER = logging.getLogger(__name__)
+
+# How long all probes together may take, the ones still running after it are left unknown
+PROBE_TIMEOUT = 20
+# How long each request of a probe may take, so the probes left running don't hold their threads for long
+PROBE_REQUEST_TIMEOUT = 10
+
+ENERGY_REDFISH = 'redfish'
+ENERGY_LEGACY = 'legacy'
+ENERGY_SYSMGMT = 'sysmgmt'
+ENERGY_NONE = 'none'
+
+
+async def async_probe_capabilities(rest: IdracRest, timeout: float = PROBE_TIMEOUT) -> dict[str, Any]:
+    """Run every probe concurrently, and return the capability profile of the iDRAC.
+
+    A capability is None when its probe failed or didn't finish in time, the client then finds out
+    at runtime like it does without a profile. The probes run on a pool of their own, with short
+    request timeouts, as the client is only used for probing.
+    """
+    probes = {
+        'firmware_version': rest.get_firmware_version,
+        'members': rest.discover_members,
+        'power': partial(rest.probe_resource, drac_power_path),
+        'legacy_energy': rest.get_energy_consumption_via_data_endpoint,
+        'sysmgmt_energy': rest.get_energy_consumption_via_sysmgmt,
+        'event_log': partial(rest.probe_resource, drac_sel_entries_path, params={'$top': 1}),
+    }
+
+    start = time.monotonic()
+    rest.request_timeout = PROBE_REQUEST_TIMEOUT
+    executor = IdracExecutor(len(probes), f"idrac_probe_{rest.host}")
+    tasks = {name: asyncio.ensure_future(executor.async_submit(PRIORITY_POLL, probe))
+             for name, probe in probes.items()}
+    await asyncio.wait(tasks.values(), timeout=timeout)
+    # The probes still running finish on their own within their request timeouts
+    executor.shutdown()
+
+    results = {}
+    for name, task in tasks.items():
+        if not task.done():
+            _LOGGER.debug(f"Probing {name} of {rest.host} didn't finish within {timeout}s")
+        elif task.exception() is not None:
+            _LOGGER.debug(f"Probing {name} of {rest.host} failed: {task.exception()}")
+        else:
+            results[name] = task.result()
+
+    power = results.get('power')
+    redfish_energy = None
+    if power is not None and power.status_code == 200:
+        try:
+            power_metrics = power_control(power.json()).get(JSON_POWER_METRICS) or {}
+            redfish_energy = power_metrics.get(JSON_ENERGY_CONSUMED_KWH) is not None
+        except (ValueError, AttributeError, IndexError, TypeError) as e:
+            _LOGGER.debug(f"Probing power of {rest.host} returned an unexpected response: {e}")
+
+    # The energy sources in the order the client prefers them
+    energy_source = ENERGY_NONE
+    for source, supported in ((ENERGY_REDFISH, redfish_energy),
+                              (ENERGY_LEGACY, _energy_supported(results, 'legacy_energy',
+                                                                rest._legacy_endpoint_supported)),
+                              (ENERGY_SYSMGMT, _energy_supported(results, 'sysmgmt_energy',
+                                                                 rest._sysmgmt_endpoint_supported))):
+        if supported is None:
+            energy_source = None
+            break
+        if supported:
+            energy_source = source
+            break
+
+    profile = {
+        'firmware_version': results.get('firmware_version'),
+        'members': results.get('members'),
+        'energy_source': energy_source,
+        'etag': 'ETag' in power.headers if power is not None and power.status_code == 200 else None,
+        'event_log': _found(results.get('event_log')),
+        'probe_duration': round(time.monotonic() - start, 2),
+    }
+    _LOGGER.debug(f"Capabilities of {rest.host}: {profile}")
+    return profile
+
+
+def apply_capabilities(rest: IdracRest, profile: dict[str, Any]) -> None:
+    """Configure the client with the capabilities which are known."""
+    energy_source = profile.get('energy_source')
+    if energy_source is not None:
+        rest.configure_energy_source(energy_source == ENERGY_LEGACY, energy_source == ENERGY_SYSMGMT)
+    if profile.get('etag') is False:
+        # Without ETags every conditional request would be a plain one anyway
+        rest.conditional_requests = False
+
+
+def _energy_supported(results: dict, name: str, endpoint_supported: bool) -> bool | None:
+    """Whether a legacy energy endpoint works, None unless the probe read the energy or definitely failed.
+
+    The legacy reads return None for timeouts, failed logins and unexpected responses alike, only a 404
+    on the login marks the endpoint as unsupported on the client.
+    """
+    if results.get(name) is not None:
+        return True
+    if not endpoint_supported:
+        return False
+    return None
+
+
+def _found(response) -> bool | None:
+    if response is None:
+        return None
+    return response.status_code == 200
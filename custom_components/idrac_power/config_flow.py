@@ -3,27 +3,64 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Mapping
 from typing import Any
 
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_HOST, CONF_USERNAME, CONF_PASSWORD
-from homeassistant.core import HomeAssistant as hass
+from homeassistant.core import HomeAssistant as hass, callback
 from homeassistant.data_entry_flow import FlowResult
 
 from .const import (
-    DOMAIN, JSON_MODEL, CONF_INTERVAL, CONF_INTERVAL_DEFAULT,
+    DOMAIN, JSON_MODEL, JSON_SERIAL_NUMBER, CONF_INTERVAL, CONF_INTERVAL_DEFAULT, CONF_WORKERS, CONF_WORKERS_DEFAULT,
+    CONF_RATE_LIMIT, CONF_RATE_LIMIT_DEFAULT, CONF_RATE_BURST, CONF_RATE_BURST_DEFAULT, CONF_GROUP,
+    CONF_ALIGNED, CONF_EVENT_LOG, CONF_TIMESERIES, CONF_CAPABILITIES, CONF_IPMI, CONF_IPMI_PORT,
+    CONF_IPMI_PORT_DEFAULT, CONF_ADAPTIVE, CONF_INTERVAL_MIN, CONF_INTERVAL_MIN_DEFAULT, CONF_INTERVAL_MAX,
+    CONF_INTERVAL_MAX_DEFAULT, CONF_DEADBAND, CONF_DEADBAND_DEFAULT, CONF_INTERVAL_OFF, CONF_INTERVAL_OFF_DEFAULT,
 )
-from .idrac_rest import IdracRest, CannotConnect, InvalidAuth, RedfishConfig, IdracMock
+from .capabilities import async_probe_capabilities
+from .idrac_rest import IdracRest, CannotConnect, InvalidAuth, RedfishConfig, IdracMock, is_mock_host
 
 _LOGGER = logging.getLogger(__name__)
 
+
+def _settings_schema(data: Mapping[str, Any]) -> dict:
+    """The fields of the settings the options can change later, defaulting to the ones in data."""
+    return {
+        vol.Required(CONF_INTERVAL, default=data.get(CONF_INTERVAL, CONF_INTERVAL_DEFAULT)): int,
+        vol.Required(CONF_ADAPTIVE, default=data.get(CONF_ADAPTIVE, False)): bool,
+        vol.Required(CONF_INTERVAL_MIN, default=data.get(CONF_INTERVAL_MIN, CONF_INTERVAL_MIN_DEFAULT)):
+            vol.All(int, vol.Range(min=1)),
+        vol.Required(CONF_INTERVAL_MAX, default=data.get(CONF_INTERVAL_MAX, CONF_INTERVAL_MAX_DEFAULT)):
+            vol.All(int, vol.Range(min=1)),
+        vol.Required(CONF_DEADBAND, default=data.get(CONF_DEADBAND, CONF_DEADBAND_DEFAULT)):
+            vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Required(CONF_INTERVAL_OFF, default=data.get(CONF_INTERVAL_OFF, CONF_INTERVAL_OFF_DEFAULT)):
+            vol.All(int, vol.Range(min=1)),
+        vol.Required(CONF_WORKERS, default=data.get(CONF_WORKERS, CONF_WORKERS_DEFAULT)):
+            vol.All(int, vol.Range(min=1, max=16)),
+        vol.Required(CONF_RATE_LIMIT, default=data.get(CONF_RATE_LIMIT, CONF_RATE_LIMIT_DEFAULT)):
+            vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Required(CONF_RATE_BURST, default=data.get(CONF_RATE_BURST, CONF_RATE_BURST_DEFAULT)):
+            vol.All(int, vol.Range(min=1)),
+        # Suggested rather than defaulted, so clearing the field removes the entry from its group
+        vol.Optional(CONF_GROUP, default='', description={'suggested_value': data.get(CONF_GROUP, '')}): str,
+        vol.Required(CONF_ALIGNED, default=data.get(CONF_ALIGNED, False)): bool,
+        vol.Required(CONF_EVENT_LOG, default=data.get(CONF_EVENT_LOG, False)): bool,
+        vol.Required(CONF_TIMESERIES, default=data.get(CONF_TIMESERIES, False)): bool,
+        vol.Required(CONF_IPMI, default=data.get(CONF_IPMI, False)): bool,
+        vol.Required(CONF_IPMI_PORT, default=data.get(CONF_IPMI_PORT, CONF_IPMI_PORT_DEFAULT)):
+            vol.All(int, vol.Range(min=1, max=65535)),
+    }
+
+
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_HOST): str,
         vol.Required(CONF_USERNAME): str,
         vol.Required(CONF_PASSWORD): str,
-        vol.Required(CONF_INTERVAL, default=CONF_INTERVAL_DEFAULT): int,
+        **_settings_schema({}),
     }
 )
 
@@ -34,6 +71,11 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> OptionsFlow:
+        return OptionsFlow()
+
     async def async_step_user(
             self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -43,10 +85,13 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 step_id="user", data_schema=STEP_USER_DATA_SCHEMA
             )
 
+        # Reject a host which is already configured before connecting to it
+        self._async_abort_entries_match({CONF_HOST: user_input[CONF_HOST]})
+
         errors = {}
 
         try:
-            info = await self.validate_input(user_input)
+            rest_client, device_info = await self.validate_input(user_input)
         except CannotConnect:
             errors["base"] = "cannot_connect"
         except InvalidAuth:
@@ -58,14 +103,22 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors["base"] = "unknown"
 
         else:
-            return self.async_create_entry(title=info["model_name"], data=user_input)
+            # The same BMC may have been added through another host name or address
+            await self.async_set_unique_id(device_info[JSON_SERIAL_NUMBER])
+            self._abort_if_unique_id_configured()
+
+            # Now that the credentials work, find out what this iDRAC supports all at once
+            capabilities = await async_probe_capabilities(rest_client)
+            return self.async_create_entry(
+                title=device_info[JSON_MODEL], data={**user_input, CONF_CAPABILITIES: capabilities}
+            )
 
         return self.async_show_form(
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
 
-    async def validate_input(self, data: dict[str, Any]) -> dict[str, Any]:
-        if data[CONF_HOST] == 'MOCK':
+    async def validate_input(self, data: dict[str, Any]) -> tuple[IdracRest, dict[str, Any]]:
+        if is_mock_host(data[CONF_HOST]):
             rest_client = IdracMock(
                 host=data[CONF_HOST],
                 username=data[CONF_USERNAME],
@@ -81,6 +134,24 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
 
         device_info = await hass.async_add_executor_job(self.hass, target=rest_client.get_device_info)
-        model_name = device_info[JSON_MODEL]
+        if not device_info:
+            raise CannotConnect(f"{data[CONF_HOST]} didn't return its device info")
+        return rest_client, device_info
+
 
-        return dict(model_name=model_name)
+class OptionsFlow(config_entries.OptionsFlow):
+    """Change the settings of an iDRAC after it was added, which reloads its entry."""
+
+    async def async_step_init(
+            self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        if user_input is not None:
+            # The settings are read from the entry's data, where the ones entered when adding it are
+            self.hass.config_entries.async_update_entry(
+                self.config_entry, data={**self.config_entry.data, **user_input}
+            )
+            return self.async_create_entry(title="", data={})
+
+        return self.async_show_form(
+            step_id="init", data_schema=vol.Schema(_settings_schema(self.config_entry.data))
+        )
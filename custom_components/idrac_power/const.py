@@ -6,12 +6,61 @@ DATA_IDRAC_REST_CLIENT = 'client'
 DATA_IDRAC_INFO = 'info'
 DATA_IDRAC_FIRMWARE = 'firmware'
 DATA_IDRAC_THERMAL = 'thermal'
+DATA_IDRAC_EXECUTOR = 'executor'
+DATA_IDRAC_POLLER = 'poller'
+DATA_AGGREGATOR = 'aggregator'
+DATA_ALIGNED_POLLS = 'aligned_polls'
+DATA_TIMESERIES = 'timeseries'
+DATA_SETUP_TIMINGS = 'setup_timings'
+DATA_REGISTRY = 'registry'
+DATA_CONNECTION = 'connection'
 
 HOST = 'host'
+MOCK_HOST = 'MOCK'
 USERNAME = 'username'
 PASSWORD = 'password'
 CONF_INTERVAL = 'interval'
 CONF_INTERVAL_DEFAULT = 300
+CONF_WORKERS = 'workers'
+CONF_WORKERS_DEFAULT = 2
+CONF_RATE_LIMIT = 'rate_limit'
+CONF_RATE_LIMIT_DEFAULT = 2.0
+CONF_RATE_BURST = 'rate_burst'
+CONF_RATE_BURST_DEFAULT = 5
+CONF_GROUP = 'group'
+CONF_ALIGNED = 'aligned'
+CONF_EVENT_LOG = 'event_log'
+CONF_TIMESERIES = 'timeseries'
+CONF_CAPABILITIES = 'capabilities'
+CONF_IPMI = 'ipmi'
+CONF_IPMI_PORT = 'ipmi_port'
+CONF_IPMI_PORT_DEFAULT = 623
+CONF_ADAPTIVE = 'adaptive'
+CONF_INTERVAL_MIN = 'interval_min'
+CONF_INTERVAL_MIN_DEFAULT = 15
+CONF_INTERVAL_MAX = 'interval_max'
+CONF_INTERVAL_MAX_DEFAULT = 900
+# How much a reading may move, in percent, before its metric is polled faster
+CONF_DEADBAND = 'deadband'
+CONF_DEADBAND_DEFAULT = 2.0
+CONF_INTERVAL_OFF = 'interval_off'
+CONF_INTERVAL_OFF_DEFAULT = 600
+ALIGNED_MAX_CONCURRENT_POLLS = 8
+# Restored readings older than this many poll intervals are stale
+RESTORE_MAX_INTERVALS = 3
+
+# The readings passed to IdracRest.callback_samples
+SAMPLE_POWER = 'power'
+SAMPLE_ENERGY = 'energy'
+SAMPLE_THERMALS = 'thermals'
+
+# The metrics and resolutions of the time series store, see timeseries.py
+SAMPLE_INLET_TEMPERATURE = 'inlet_temperature'
+TIMESERIES_METRICS = (SAMPLE_POWER, SAMPLE_ENERGY, SAMPLE_INLET_TEMPERATURE)
+RESOLUTION_RAW = 'raw'
+RESOLUTION_MINUTE = 'minute'
+RESOLUTION_HOUR = 'hour'
+RESOLUTIONS = (RESOLUTION_RAW, RESOLUTION_MINUTE, RESOLUTION_HOUR)
 
 JSON_MANUFACTURER = 'Manufacturer'
 JSON_MODEL = 'Model'
@@ -21,7 +70,33 @@ JSON_FIRMWARE_VERSION = 'FirmwareVersion'
 JSON_POWER_CONSUMED_WATTS = 'PowerConsumedWatts'
 JSON_STATUS = "Status"
 JSON_STATUS_STATE = "State"
+JSON_POWER_STATE = "PowerState"
 JSON_POWER_METRICS = "PowerMetrics"
 JSON_ENERGY_CONSUMED_KWH = "EnergyConsumedKWh"
+JSON_POWER_CONTROL = "PowerControl"
+JSON_POWER_SUPPLIES = "PowerSupplies"
+JSON_VOLTAGES = "Voltages"
+
+EVENT_LOG_ENTRIES = 'idrac_power_log_entries'
+
+SERVICE_BULK_POWER_ACTION = 'bulk_power_action'
+ATTR_CONFIG_ENTRY_IDS = 'config_entry_ids'
+ATTR_RESET_TYPE = 'reset_type'
+ATTR_MAX_CONCURRENCY = 'max_concurrency'
+ATTR_STAGGER = 'stagger'
+SERVICE_QUERY_TIMESERIES = 'query_timeseries'
+ATTR_CONFIG_ENTRY_ID = 'config_entry_id'
+ATTR_SYSTEM_ID = 'system_id'
+ATTR_METRIC = 'metric'
+ATTR_START = 'start'
+ATTR_END = 'end'
+ATTR_RESOLUTION = 'resolution'
+SERVICE_PROFILE_POLLS = 'profile_polls'
+ATTR_SAMPLE_RATE = 'sample_rate'
+ATTR_MAX_SPANS = 'max_spans'
+SERVICE_EXPORT_TRACE = 'export_trace'
+ATTR_FORMAT = 'format'
+ATTR_CLEAR = 'clear'
+RESET_TYPES = ['On', 'ForceOff', 'ForceRestart', 'GracefulShutdown', 'PushPowerButton', 'Nmi']
 
 SCAN_INTERVAL = timedelta(seconds=5)
@@ -0,0 +1,71 @@
+"""Devices of the computer systems monitored by a config entry."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import PlatformNotReady
+from homeassistant.helpers.entity import DeviceInfo
+
+from .const import (DOMAIN, DATA_IDRAC_REST_CLIENT, DATA_IDRAC_EXECUTOR, DATA_IDRAC_INFO, DATA_IDRAC_FIRMWARE,
+                    JSON_MODEL, JSON_MANUFACTURER, JSON_SERIAL_NUMBER)
+from .executor import PRIORITY_POLL
+from .idrac_rest import IdracRest, CannotConnect, RedfishConfig
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class IdracDevice:
+    """A computer system behind the iDRAC, with the client which monitors it."""
+
+    def __init__(self, rest: IdracRest, device_info: DeviceInfo, serial: str, name: str):
+        self.rest = rest
+        self.device_info = device_info
+        self.serial = serial
+        self.name = name
+
+
+async def async_get_devices(hass: HomeAssistant, entry: ConfigEntry) -> list[IdracDevice]:
+    """Return a device per system of the entry, the first platform to set up fetches their info."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    rest_client: IdracRest = data[DATA_IDRAC_REST_CLIENT]
+    executor = data[DATA_IDRAC_EXECUTOR]
+
+    try:
+        infos = data.setdefault(DATA_IDRAC_INFO, {})
+        missing = [member for member in rest_client.members if member.system_id not in infos]
+        for member, info in zip(missing, await asyncio.gather(
+                *(executor.async_submit(PRIORITY_POLL, member.get_device_info) for member in missing))):
+            if not info:
+                raise PlatformNotReady(f"Could not set up {member.system_id}: device didn't return anything.")
+            infos[member.system_id] = info
+
+        firmware_version = await executor.async_submit(PRIORITY_POLL, rest_client.get_firmware_version)
+        if not firmware_version:
+            if DATA_IDRAC_FIRMWARE in data:
+                firmware_version = data[DATA_IDRAC_FIRMWARE]
+        else:
+            data[DATA_IDRAC_FIRMWARE] = firmware_version
+    except (CannotConnect, RedfishConfig) as e:
+        raise PlatformNotReady(str(e)) from e
+
+    devices = []
+    for member in rest_client.members:
+        info = infos[member.system_id]
+        model = info[JSON_MODEL]
+        # A single server keeps the plain model as its name, so its unique ids stay the same
+        name = model if len(rest_client.members) == 1 else f"{model} {member.system_id}"
+        serial = info[JSON_SERIAL_NUMBER]
+
+        devices.append(IdracDevice(member, DeviceInfo(
+            identifiers={(DOMAIN, serial)},
+            name=name,
+            manufacturer=info[JSON_MANUFACTURER],
+            model=model,
+            sw_version=firmware_version,
+            serial_number=serial
+        ), serial, name))
+
+    return devices
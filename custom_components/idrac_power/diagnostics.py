@@ -0,0 +1,40 @@
+"""Diagnostics support for the iDRAC power monitor."""
+from __future__ import annotations
+
+import sys
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (DOMAIN, DATA_IDRAC_REST_CLIENT, DATA_IDRAC_EXECUTOR, DATA_SETUP_TIMINGS, DATA_CONNECTION, USERNAME,
+                    PASSWORD)
+
+TO_REDACT = {USERNAME, PASSWORD}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    rest_client = data[DATA_IDRAC_REST_CLIENT]
+
+    return {
+        'entry': async_redact_data(entry.as_dict(), TO_REDACT),
+        'executor': data[DATA_IDRAC_EXECUTOR].stats(),
+        'rate_limiter': rest_client.rate_limiter.stats(),
+        'conditional_requests': rest_client.conditional_stats(),
+        'ipmi': rest_client.ipmi is not None,
+        'profiling': rest_client.profiler.stats(),
+        'poll_intervals': {member.system_id: member.poll_intervals for member in rest_client.members},
+        'setup_timings': data[DATA_SETUP_TIMINGS].as_dict(),
+        # Only imported once an entry actually uses the legacy energy endpoints
+        'legacy_loaded': f"{__package__}.legacy" in sys.modules,
+        # The other entries of the same BMC, which share this connection
+        'shared_with': sorted(data[DATA_CONNECTION].entry_ids - {entry.entry_id}),
+        'members': [
+            {'system_id': member.system_id, 'chassis_id': member.chassis_id,
+             'poll_plan': data[DATA_CONNECTION].poller.poll_plan(member)}
+            for member in rest_client.members
+        ],
+    }
@@ -0,0 +1,71 @@
+"""Incremental reading of the iDRAC's System Event Log into Home Assistant events."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, HOST, EVENT_LOG_ENTRIES
+from .executor import IdracExecutor, PRIORITY_LEGACY
+from .idrac_rest import IdracRest
+from .registry import connection_key
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+# The most log entries fired in one event
+LOG_EVENT_BATCH_SIZE = 50
+
+
+def log_store(hass: HomeAssistant, key: str) -> Store:
+    """The store of the log cursor of the connection with the key, which survives restarts."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{key}.event_log")
+
+
+class IdracLogReader:
+    """Fires the entries added to the System Event Log since the last read, in batches."""
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, rest: IdracRest, executor: IdracExecutor):
+        self.hass = hass
+        self.entry = entry
+        self.rest = rest
+        self.executor = executor
+
+        self._store = log_store(hass, connection_key(rest.host, entry.unique_id))
+        self._cursor: int | None = None
+        self._loaded = False
+
+    async def async_update(self) -> None:
+        if not self._loaded:
+            self._cursor = (await self._store.async_load() or {}).get('cursor')
+            self._loaded = True
+
+        entries, cursor = await self.executor.async_submit(
+            PRIORITY_LEGACY, self.rest.get_new_log_entries, self._cursor
+        )
+
+        if entries:
+            _LOGGER.debug(f"Read {len(entries)} new event log entries of {self.entry.entry_id}")
+        for start in range(0, len(entries), LOG_EVENT_BATCH_SIZE):
+            self.hass.bus.async_fire(EVENT_LOG_ENTRIES, {
+                'config_entry_id': self.entry.entry_id,
+                'host': self.entry.data[HOST],
+                'entries': [_event_data(entry) for entry in entries[start:start + LOG_EVENT_BATCH_SIZE]],
+            })
+
+        if cursor != self._cursor:
+            self._cursor = cursor
+            await self._store.async_save({'cursor': cursor})
+
+
+def _event_data(entry: dict) -> dict:
+    return {
+        'id': entry.get('Id'),
+        'created': entry.get('Created'),
+        'severity': entry.get('Severity'),
+        'message': entry.get('Message'),
+        'message_id': entry.get('MessageId'),
+        'sensor_type': entry.get('SensorType'),
+    }
@@ -0,0 +1,130 @@
+"""Bounded priority thread pool for the blocking iDRAC I/O."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_POWER_ACTION = 0
+PRIORITY_POLL = 1
+PRIORITY_LEGACY = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_POWER_ACTION: 'power_action',
+    PRIORITY_POLL: 'poll',
+    PRIORITY_LEGACY: 'legacy',
+}
+
+_SHUTDOWN = object()
+
+
+class IdracExecutor:
+    """A small thread pool which runs queued jobs in priority order.
+
+    Home Assistant's shared executor is used by every integration, so a handful of hung iDRACs
+    could starve unrelated work. This pool caps the number of threads this integration occupies,
+    and lets power actions and polls overtake slow legacy logins waiting in the queue.
+    """
+
+    def __init__(self, max_workers: int, name: str):
+        self.max_workers = max(1, max_workers)
+        self.name = name
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+        self._busy = 0
+        self._wait_stats: dict[int, dict[str, float]] = {
+            priority: {'jobs': 0, 'wait_total': 0.0, 'wait_max': 0.0} for priority in PRIORITY_NAMES
+        }
+
+    def submit(self, priority: int, target: Callable[..., Any], *args) -> Future:
+        """Queue a job and return a future for its result.
+
+        The job runs in the context it was submitted from, so it sees the context variables of its poll.
+        """
+        future = Future()
+        context = contextvars.copy_context()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError(f"Executor {self.name} has been shut down")
+            self._queue.put((priority, next(self._counter), time.monotonic(), future, target, args, context))
+            if len(self._threads) < self.max_workers and self._busy + self._queue.qsize() > len(self._threads):
+                self._start_worker()
+        return future
+
+    async def async_submit(self, priority: int, target: Callable[..., Any], *args) -> Any:
+        """Run a job on the pool and await its result from the event loop."""
+        return await asyncio.wrap_future(self.submit(priority, target, *args))
+
+    def shutdown(self) -> None:
+        """Stop the workers once the jobs already queued have run."""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            for _ in self._threads:
+                self._queue.put((float('inf'), next(self._counter), 0.0, None, _SHUTDOWN, (), None))
+
+    def stats(self) -> dict:
+        """Return queue-wait metrics, used to size the pool."""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'threads': len(self._threads),
+                'busy': self._busy,
+                'queued': self._queue.qsize(),
+                'queue_wait': {
+                    PRIORITY_NAMES[priority]: {
+                        'jobs': int(stats['jobs']),
+                        'wait_avg': stats['wait_total'] / stats['jobs'] if stats['jobs'] else 0.0,
+                        'wait_max': stats['wait_max'],
+                    }
+                    for priority, stats in self._wait_stats.items()
+                },
+            }
+
+    def _start_worker(self) -> None:
+        thread = threading.Thread(
+            target=self._work, name=f"{self.name}_{len(self._threads)}", daemon=True
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _work(self) -> None:
+        while True:
+            priority, _, queued_at, future, target, args, context = self._queue.get()
+            if target is _SHUTDOWN:
+                return
+
+            waited = time.monotonic() - queued_at
+            with self._lock:
+                self._busy += 1
+                stats = self._wait_stats.setdefault(priority, {'jobs': 0, 'wait_total': 0.0, 'wait_max': 0.0})
+                stats['jobs'] += 1
+                stats['wait_total'] += waited
+                stats['wait_max'] = max(stats['wait_max'], waited)
+
+            if waited > 5:
+                _LOGGER.debug(f"Job {target.__name__} waited {waited:.1f}s in the {self.name} queue")
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(context.run(target, *args))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._busy -= 1
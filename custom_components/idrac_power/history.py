@@ -0,0 +1,82 @@
+"""Import of the power history the iDRAC keeps itself into the long-term statistics."""
+from __future__ import annotations
+
+import logging
+import math
+import time
+from datetime import datetime
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR = 3600
+
+
+async def async_import_power_history(hass: HomeAssistant, statistic_id: str,
+                                     records: list[tuple[str, float, float]]) -> int:
+    """Fill the hours missing from a power sensor's statistics with the iDRAC's power graph.
+
+    Hours which already have statistics, and the current hour, are left alone. Returns the
+    number of hours imported.
+    """
+    if 'recorder' not in hass.config.components:
+        return 0
+
+    from homeassistant.components.recorder import get_instance
+    from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+    from homeassistant.components.recorder.statistics import async_import_statistics, statistics_during_period
+
+    current_hour = math.floor(time.time() / HOUR) * HOUR
+    hours = {hour: readings for hour, readings in _hourly_readings(records).items() if hour < current_hour}
+    if not hours:
+        return 0
+
+    existing = await get_instance(hass).async_add_executor_job(
+        statistics_during_period, hass, dt_util.utc_from_timestamp(min(hours)),
+        dt_util.utc_from_timestamp(max(hours) + HOUR), {statistic_id}, 'hour', None, {'mean'}
+    )
+    recorded = {
+        row['start'].timestamp() if isinstance(row['start'], datetime) else row['start']
+        for row in existing.get(statistic_id, [])
+    }
+
+    statistics = [
+        StatisticData(
+            start=dt_util.utc_from_timestamp(hour),
+            mean=sum(readings) / len(readings),
+            min=min(readings),
+            max=max(readings),
+        )
+        for hour, readings in sorted(hours.items()) if hour not in recorded
+    ]
+    if not statistics:
+        return 0
+
+    metadata = StatisticMetaData(
+        has_mean=True,
+        has_sum=False,
+        name=None,
+        source='recorder',
+        statistic_id=statistic_id,
+        unit_of_measurement='W',
+    )
+    try:
+        from homeassistant.components.recorder.models import StatisticMeanType
+        metadata['mean_type'] = StatisticMeanType.ARITHMETIC
+    except ImportError:
+        pass
+
+    _LOGGER.info(f"Importing {len(statistics)} hours of power history into {statistic_id}")
+    async_import_statistics(hass, metadata, statistics)
+    return len(statistics)
+
+
+def _hourly_readings(records: list[tuple[str, float, float]]) -> dict[int, list[float]]:
+    """Group the readings per hour, taking each hour from the finest graph covering it."""
+    graphs: dict[int, dict[str, list[float]]] = {}
+    for graph, timestamp, watts in records:
+        hour = math.floor(timestamp / HOUR) * HOUR
+        graphs.setdefault(hour, {}).setdefault(graph, []).append(watts)
+    return {hour: max(readings.values(), key=len) for hour, readings in graphs.items()}
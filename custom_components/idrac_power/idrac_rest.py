@@ -1,30 +1,65 @@
+from __future__ import annotations
+
 import logging
+import threading
 import time
-import re
-import xml.etree.ElementTree as ET
-from typing import Callable
+from typing import TYPE_CHECKING, Any, Callable
 
 import requests
 import urllib3
 from homeassistant.exceptions import HomeAssistantError
 from requests import Response
 from requests.exceptions import RequestException, JSONDecodeError, HTTPError
+from .executor import PRIORITY_POWER_ACTION, PRIORITY_POLL, PRIORITY_LEGACY
+from .profiling import PollProfiler, profiled_request
+from .ratelimit import get_rate_limiter
 from .const import (
     JSON_NAME, JSON_MANUFACTURER, JSON_MODEL, JSON_SERIAL_NUMBER,
     JSON_POWER_CONSUMED_WATTS, JSON_FIRMWARE_VERSION, JSON_STATUS, JSON_STATUS_STATE,
-    JSON_POWER_METRICS, JSON_ENERGY_CONSUMED_KWH
+    JSON_POWER_METRICS, JSON_ENERGY_CONSUMED_KWH, JSON_POWER_STATE, JSON_POWER_CONTROL, JSON_POWER_SUPPLIES,
+    JSON_VOLTAGES, MOCK_HOST, SAMPLE_POWER, SAMPLE_ENERGY, SAMPLE_THERMALS
 )
 
+if TYPE_CHECKING:
+    from .ipmi import IpmiTransport
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 _LOGGER = logging.getLogger(__name__)
 
 protocol = 'https://'
 drac_managers_path = '/redfish/v1/Managers/iDRAC.Embedded.1'
-drac_chassis_path = '/redfish/v1/Chassis/System.Embedded.1'
-drac_powercontrol_path = '/redfish/v1/Chassis/System.Embedded.1/Power/PowerControl'
-drac_reset_path = '/redfish/v1/Systems/System.Embedded.1/Actions/ComputerSystem.Reset'
-drac_thermals = '/redfish/v1/Chassis/System.Embedded.1/Thermal'
+drac_sel_entries_path = drac_managers_path + '/LogServices/Sel/Entries'
+drac_systems_path = '/redfish/v1/Systems'
+drac_chassis_collection_path = '/redfish/v1/Chassis'
+drac_chassis_path = drac_chassis_collection_path + '/{chassis_id}'
+drac_power_path = drac_chassis_collection_path + '/{chassis_id}/Power'
+drac_system_path = drac_systems_path + '/{system_id}'
+drac_reset_path = drac_systems_path + '/{system_id}/Actions/ComputerSystem.Reset'
+drac_thermals = drac_chassis_collection_path + '/{chassis_id}/Thermal'
+
+DEFAULT_SYSTEM_ID = 'System.Embedded.1'
+DEFAULT_CHASSIS_ID = 'System.Embedded.1'
+
+# How long a request may take, in seconds
+REQUEST_TIMEOUT = 300
+
+LOG_PAGE_SIZE = 50
+LOG_MAX_ENTRIES = 500
+
+# With IPMI reading the power, the rest of the Power resource is only read this often, in seconds
+POWER_RESOURCE_INTERVAL = 300
+
+
+def is_mock_host(host: str) -> bool:
+    """Whether the host is MOCK, MOCK:<count> or MOCK:<count>:<n>, which are simulated by IdracMock."""
+    return host == MOCK_HOST or host.startswith(MOCK_HOST + ':')
+
+
+def power_control(power_values: dict | None) -> dict:
+    """The chassis total of a Power resource, the first of its PowerControl members."""
+    members = (power_values or {}).get(JSON_POWER_CONTROL) or [{}]
+    return members[0]
 
 
 def handle_error(result):
@@ -46,23 +81,149 @@ def handle_error(result):
 
 
 class IdracRest:
-    def __init__(self, host, username, password, interval):
+    def __init__(self, host, username, password, interval,
+                 system_id: str = DEFAULT_SYSTEM_ID, chassis_id: str = DEFAULT_CHASSIS_ID):
         self.host = host
         self.auth = (username, password)
         self.interval = interval
 
+        # The computer system and chassis this client monitors, an enclosure can hold several
+        self.system_id = system_id
+        self.chassis_id = chassis_id
+        self.members: list[IdracRest] = [self]
+
         self.callback_thermals: list[Callable[[dict | None], None]] = []
         self.callback_status: list[Callable[[bool | None], None]] = []
         self.callback_power_usage: list[Callable[[int | None], None]] = []
         self.callback_energy_consumption: list[Callable[[float | None], None]] = []
+        # Called with the Power resource when its PowerSupplies or Voltages changed
+        self.callback_power_supplies: list[Callable[[dict | None], None]] = []
+        # Called with every reading, changed or not, and the time it was sampled
+        self.callback_samples: list[Callable[[str, Any, float], None]] = []
+        # Called with the power graph records the iDRAC keeps itself, see legacy.parse_legacy_data
+        self.callback_power_history: list[Callable[[list[tuple[str, float, float]]], None]] = []
+        # Called with the adaptive poll interval of each metric when they changed
+        self.callback_poll_intervals: list[Callable[[dict[str, float]], None]] = []
+        # The callback calls queued by the updates on the worker threads, run by dispatch_updates
+        self._pending_lock = threading.Lock()
+        self._pending: list[tuple[list[Callable], tuple]] = []
 
         self.thermal_values: dict = {}
+        self.power_values: dict = {}
         self.status: bool = False
+        # Only set by a successful read of the power status, unknown counts as powered on
+        self.powered_off: bool = False
         self.power_usage: int = 0
         self.energy_consumption: float = 0
+        # The SAMPLE_POWER and SAMPLE_ENERGY readings which the last update of them failed to read, the
+        # attributes above keep their previous value then
+        self.failed_readings: set[str] = set()
+        # When the samples being polled were taken, in seconds since the epoch
+        self.sampled_at: float | None = None
+        # The current poll interval of each metric when polling adaptively, set by the poller
+        self.poll_intervals: dict[str, float] = {}
 
         self._firmware_version: str | None = None
         self._legacy_endpoint_supported: bool = True
+        # When the legacy /data endpoint last returned the energy, in monotonic seconds
+        self._legacy_data_read_at: float | None = None
+        self._sysmgmt_endpoint_supported: bool = True
+        self._energy_from_redfish: bool = False
+        # When the Power resource was last read, in the poll's seconds since the epoch
+        self._power_resource_read_at: float | None = None
+
+        # Concurrent requests for the same resource share one fetch, and successful responses are
+        # reused for cache_max_age seconds
+        self.cache_max_age: float = 2
+        self._flight_lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self._flight_cache: dict[str, tuple[float, Any]] = {}
+        # The ETag of the last response per resource, sent along with conditional requests
+        self.conditional_requests = True
+        self._etags: dict[str, str] = {}
+        self._conditional_stats = {'requests': 0, 'not_modified': 0}
+
+        self.rate_limiter = get_rate_limiter(host)
+        self.request_timeout: float = REQUEST_TIMEOUT
+        # Reads the power and power state of the iDRAC's own system over IPMI when configured
+        self.ipmi: IpmiTransport | None = None
+        # Records the phases of a sample of the polls while profiling
+        self.profiler = PollProfiler(host)
+
+    def _path(self, path: str) -> str:
+        return path.format(system_id=self.system_id, chassis_id=self.chassis_id)
+
+    def discover_members(self) -> list[tuple[str, str]]:
+        """Return the (system id, chassis id) of every computer system behind this iDRAC.
+
+        Multi-node enclosures list a system per sled. The chassis of a system is the first one it
+        links to, which holds its power and thermal resources.
+        """
+        try:
+            result = self.get_path(drac_systems_path)
+            handle_error(result)
+            system_paths = [member['@odata.id'] for member in result.json().get('Members', [])]
+        except (RequestException, KeyError) as e:
+            raise CannotConnect(f"Could not list the systems of {self.host}: {e}")
+
+        members = []
+        for system_path in system_paths:
+            system_id = system_path.rstrip('/').rsplit('/', 1)[-1]
+            chassis_id = system_id
+            try:
+                result = self.get_path(system_path)
+                handle_error(result)
+                chassis_links = result.json().get('Links', {}).get('Chassis', [])
+                if chassis_links:
+                    chassis_id = chassis_links[0]['@odata.id'].rstrip('/').rsplit('/', 1)[-1]
+            except (RequestException, RedfishConfig, CannotConnect, KeyError) as e:
+                _LOGGER.debug(f"Couldn't get the chassis of {system_id} on {self.host}, assuming the same id: {e}")
+            members.append((system_id, chassis_id))
+        return members
+
+    def configure_members(self, members: list[tuple[str, str]]) -> None:
+        """Monitor the given (system id, chassis id) pairs, this client stays the first one."""
+        if not members:
+            return
+        if (self.system_id, self.chassis_id) not in members:
+            # This client's own system doesn't exist here, let it monitor the first one instead
+            self.system_id, self.chassis_id = members[0]
+        self.members = [self] + [
+            self._create_member(system_id, chassis_id) for system_id, chassis_id in members
+            if (system_id, chassis_id) != (self.system_id, self.chassis_id)
+        ]
+
+    def _create_member(self, system_id: str, chassis_id: str) -> IdracRest:
+        """Create a client for another system, sharing this client's connection and caches."""
+        member = type(self)(self.host, self.auth[0], self.auth[1], self.interval, system_id, chassis_id)
+        member.rate_limiter = self.rate_limiter
+        member.cache_max_age = self.cache_max_age
+        member._flight_lock = self._flight_lock
+        member._flights = self._flights
+        member._flight_cache = self._flight_cache
+        member.conditional_requests = self.conditional_requests
+        member._etags = self._etags
+        member._conditional_stats = self._conditional_stats
+        member.profiler = self.profiler
+        member._firmware_version = self._firmware_version
+        # The legacy energy endpoints only know about the iDRAC's own system
+        member._legacy_endpoint_supported = False
+        member._sysmgmt_endpoint_supported = False
+        return member
+
+    def configure_rate_limit(self, rate: float, burst: int) -> None:
+        """Limit the requests to this host to rate per second, with bursts of up to burst requests."""
+        self.rate_limiter = get_rate_limiter(self.host, rate, burst)
+
+    def configure_ipmi(self, port: int) -> None:
+        """Read the power and power state over IPMI, Redfish is still used when that fails."""
+        from .ipmi import IpmiTransport
+        self.ipmi = IpmiTransport(self.host, self.auth[0], self.auth[1], port)
+
+    def configure_energy_source(self, legacy: bool, sysmgmt: bool) -> None:
+        """Only try the legacy energy endpoints which are known to work on this iDRAC."""
+        self._legacy_endpoint_supported = legacy
+        self._sysmgmt_endpoint_supported = sysmgmt
 
     def configure_firmware(self, firmware_version: str) -> None:
         """Configure client capabilities based on detected firmware version."""
@@ -85,7 +246,7 @@ class IdracRest:
 
     def get_device_info(self) -> dict | None:
         try:
-            result = self.get_path(drac_chassis_path)
+            result = self.get_path(self._path(drac_chassis_path))
         except RequestException:
             raise CannotConnect(f"Cannot connect to {self.host}")
 
@@ -110,8 +271,153 @@ class IdracRest:
         manager_results = result.json()
         return manager_results[JSON_FIRMWARE_VERSION]
 
-    def get_path(self, path):
-        return requests.get(protocol + self.host + path, auth=self.auth, verify=False, timeout=300)
+    def get_new_log_entries(self, cursor: int | None) -> tuple[list[dict], int | None]:
+        """Return the System Event Log entries after cursor, oldest first, and the cursor to continue from.
+
+        The iDRAC lists the newest entries first, so pages are fetched until one reaches the cursor,
+        up to LOG_MAX_ENTRIES. Without a cursor nothing is returned and reading starts from the newest
+        entry, so the existing log isn't replayed; an empty log starts from 0, so its first entries are
+        new. When the log was cleared, its ids restart below the cursor and every entry is new.
+        """
+        entries = []
+        newest = None
+        skip = 0
+        while skip < LOG_MAX_ENTRIES:
+            try:
+                result = self._request(
+                    'GET', protocol + self.host + drac_sel_entries_path, priority=PRIORITY_LEGACY, auth=self.auth,
+                    params={'$top': LOG_PAGE_SIZE, '$skip': skip}
+                )
+            except RequestException:
+                raise CannotConnect(f"Could not get the event log of {self.host}")
+
+            handle_error(result)
+
+            page = result.json().get('Members', [])
+            reached = False
+            for member in page:
+                entry_id = _log_entry_id(member)
+                if entry_id is None:
+                    continue
+                if newest is None:
+                    newest = entry_id
+                    if cursor is not None and newest < cursor:
+                        _LOGGER.info(f"The event log of {self.host} was cleared")
+                        cursor = 0
+                if cursor is None or entry_id <= cursor:
+                    reached = True
+                    break
+                entries.append(member)
+
+            if reached or len(page) < LOG_PAGE_SIZE:
+                break
+            skip += LOG_PAGE_SIZE
+        else:
+            _LOGGER.warning(f"More than {LOG_MAX_ENTRIES} new entries in the event log of {self.host}, "
+                            f"skipping the older ones")
+
+        entries.reverse()
+        if newest is None:
+            return entries, 0 if cursor is None else cursor
+        return entries, newest
+
+    def probe_resource(self, path: str, **kwargs) -> Response | None:
+        """GET a resource of this system to see whether it's supported, None if the iDRAC can't be reached."""
+        try:
+            return self._request('GET', protocol + self.host + self._path(path), auth=self.auth, **kwargs)
+        except RequestException:
+            return None
+
+    def get_path(self, path, max_age: float | None = None, conditional: bool = False):
+        """GET a Redfish resource, sharing the response with concurrent and recent requests for it.
+
+        A conditional request sends the ETag of the last response, and the iDRAC answers with
+        a 304 without a body when the resource didn't change since. iDRACs which don't send ETags
+        only get plain requests.
+        """
+        conditional = conditional and self.conditional_requests
+        return self._single_flight(
+            f'{path} conditional' if conditional else path,
+            lambda: self._get(path, conditional),
+            self.cache_max_age if max_age is None else max_age,
+            lambda response: response.status_code == 200
+        )
+
+    def _get(self, path: str, conditional: bool) -> Response:
+        headers = {}
+        if conditional and path in self._etags:
+            headers['If-None-Match'] = self._etags[path]
+
+        response = self._request('GET', protocol + self.host + path, auth=self.auth, headers=headers)
+
+        if conditional:
+            with self._flight_lock:
+                self._conditional_stats['requests'] += 1
+                if response.status_code == 304:
+                    self._conditional_stats['not_modified'] += 1
+                elif response.status_code == 200 and 'ETag' in response.headers:
+                    self._etags[path] = response.headers['ETag']
+                else:
+                    self._etags.pop(path, None)
+        return response
+
+    def forget_etag(self, path: str) -> None:
+        """Make the next conditional request for path fetch it in full, e.g. when its last response was lost."""
+        with self._flight_lock:
+            self._etags.pop(path, None)
+
+    def conditional_stats(self) -> dict:
+        """Return how many conditional requests were answered with 304 Not Modified."""
+        with self._flight_lock:
+            stats = dict(self._conditional_stats)
+        stats['hit_ratio'] = round(stats['not_modified'] / stats['requests'], 3) if stats['requests'] else None
+        return stats
+
+    def _request(self, method: str, url: str, priority: int = PRIORITY_POLL, **kwargs) -> Response:
+        """Send an HTTP request to the iDRAC, once the host's rate limiter allows it."""
+        with self.profiler.span('rate_limit'):
+            self.rate_limiter.acquire(priority)
+        if not self.profiler.sampling:
+            return requests.request(method, url, verify=False, timeout=self.request_timeout, **kwargs)
+        with self.profiler.span('request', method=method, url=url):
+            return profiled_request(method, url, verify=False, timeout=self.request_timeout, **kwargs)
+
+    def invalidate_cache(self) -> None:
+        """Forget the cached responses, e.g. after an action changed the state of the server."""
+        with self._flight_lock:
+            self._flight_cache.clear()
+
+    def _single_flight(self, key: str, fetch: Callable[[], Any], max_age: float = 0,
+                       cacheable: Callable[[Any], bool] = lambda result: True) -> Any:
+        """Run fetch, unless the same key is already in flight; then wait for and return its result."""
+        with self._flight_lock:
+            cached = self._flight_cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] <= max_age:
+                return cached[1]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flight_lock:
+                del self._flights[key]
+                if max_age > 0 and flight.error is None and cacheable(flight.result):
+                    self._flight_cache[key] = (time.monotonic(), flight.result)
+            flight.done.set()
 
     def idrac_reset(self, reset_type: str) -> Response | None:
         '''
@@ -127,11 +433,10 @@ class IdracRest:
                        and typically, terminate all the processes running in the system.
         '''
         try:
-            response = requests.post(url=f'{protocol}{self.host}{drac_reset_path}',
+            response = self._request('POST', protocol + self.host + self._path(drac_reset_path),
+                                     priority=PRIORITY_POWER_ACTION,
                                      auth=self.auth,
-                                     verify=False,
-                                     json={"ResetType": reset_type},
-                                     timeout=300)
+                                     json={"ResetType": reset_type})
         except RequestException as e:
             raise CannotConnect(f"Could not perform '{reset_type}' iDRAC reset on {self.host}: {e}")
 
@@ -164,171 +469,169 @@ class IdracRest:
             error_message = json["error"]["@Message.ExtendedInfo"][0]["Message"]
             _LOGGER.error(f"iDRAC '{reset_type}' iDRAC reset failed: {error_message}")
 
+        self.invalidate_cache()
         return response
 
-    def register_callback_thermals(self, callback: Callable[[dict | None], None]) -> None:
-        self.callback_thermals.append(callback)
+    @staticmethod
+    def _register(callbacks: list[Callable], callback: Callable) -> Callable[[], None]:
+        """Add a callback, and return the function which removes it again."""
+        callbacks.append(callback)
+        return lambda: callbacks.remove(callback)
+
+    def register_callback_thermals(self, callback: Callable[[dict | None], None]) -> Callable[[], None]:
+        return self._register(self.callback_thermals, callback)
 
-    def register_callback_status(self, callback: Callable[[bool | None], None]) -> None:
-        self.callback_status.append(callback)
+    def register_callback_status(self, callback: Callable[[bool | None], None]) -> Callable[[], None]:
+        return self._register(self.callback_status, callback)
 
-    def register_callback_power_usage(self, callback: Callable[[int | None], None]) -> None:
-        self.callback_power_usage.append(callback)
+    def register_callback_power_usage(self, callback: Callable[[int | None], None]) -> Callable[[], None]:
+        return self._register(self.callback_power_usage, callback)
         
-    def register_callback_energy_consumption(self, callback: Callable[[float | None], None]) -> None:
+    def register_callback_power_supplies(self, callback: Callable[[dict | None], None]) -> Callable[[], None]:
+        """Register callback for the PowerSupplies and Voltages of the Power resource."""
+        return self._register(self.callback_power_supplies, callback)
+
+    def register_callback_energy_consumption(self, callback: Callable[[float | None], None]) -> Callable[[], None]:
         """Register callback for energy consumption updates."""
-        self.callback_energy_consumption.append(callback)
-        
+        return self._register(self.callback_energy_consumption, callback)
+
+    def register_callback_power_history(
+            self, callback: Callable[[list[tuple[str, float, float]]], None]) -> Callable[[], None]:
+        return self._register(self.callback_power_history, callback)
+
+    def register_callback_poll_intervals(self, callback: Callable[[dict[str, float]], None]) -> Callable[[], None]:
+        return self._register(self.callback_poll_intervals, callback)
+
+    def register_callback_samples(self, callback: Callable[[str, Any, float], None]) -> Callable[[], None]:
+        """Register callback for every reading of the SAMPLE_* metrics, with its timestamp."""
+        return self._register(self.callback_samples, callback)
+
+    def _sample(self, metric: str, value: Any) -> None:
+        sampled_at = time.time() if self.sampled_at is None else self.sampled_at
+        self._notify(self.callback_samples, metric, value, sampled_at)
+
+    def _notify(self, callbacks: list[Callable], *args) -> None:
+        """Queue a call of every callback with args, until the next dispatch_updates."""
+        if callbacks:
+            with self._pending_lock:
+                self._pending.append((callbacks, args))
+
+    def dispatch_updates(self) -> None:
+        """Run the callbacks of every update since the last dispatch, in order, from the event loop.
+
+        A poll updates many entities, dispatching them together writes their states in a single
+        pass of the loop instead of handing each one over from its worker thread separately.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        with self.profiler.span('dispatch', system_id=self.system_id, updates=len(pending)):
+            for callbacks, args in pending:
+                for callback in list(callbacks):
+                    try:
+                        callback(*args)
+                    except Exception:
+                        _LOGGER.exception(f"Error in an update callback of {self.host} {self.system_id}")
+
     def get_energy_consumption_via_data_endpoint(self) -> float | None:
         """Get energy consumption using the legacy /data endpoint (pre-7.x firmware)."""
-        st1 = None
-        st2 = None
-        login_response = None
-        try:
-            login_url = f"{protocol}{self.host}/data/login"
-            payload = {"user": self.auth[0], "password": self.auth[1]}
+        # Only loaded by the iDRACs which use this energy source
+        from .legacy import get_energy_consumption_via_data_endpoint
+        return get_energy_consumption_via_data_endpoint(self)
 
-            login_response = requests.post(login_url, data=payload, verify=False, timeout=300)
-            if login_response.status_code == 404:
-                _LOGGER.info(
-                    "Legacy /data endpoint not available on %s (HTTP 404) - disabling for future requests",
-                    self.host
-                )
-                self._legacy_endpoint_supported = False
-                return None
-            if login_response.status_code != 200:
-                _LOGGER.debug(f"Legacy login on {self.host} failed with status code: {login_response.status_code}")
-                return None
-
-            match = re.search(r'ST1=([^,]+),ST2=([^<"]+)', login_response.text)
-            if not match:
-                _LOGGER.debug("Failed to extract authentication tokens from %s", self.host)
-                return None
-
-            st1 = match.group(1)
-            st2 = match.group(2)
-
-            power_url = f"{protocol}{self.host}/data"
-            params = {
-                "get": "powermonitordata,powergraphdata,psRedundancy,pwState,"
-                       "pbtEnabled,activePLPolicy,activePLimit,pwrBudgetVal,powerSupplies,pbMaxWatts"
-            }
-            headers = {"ST2": st2, "Content-Type": "application/x-www-form-urlencoded"}
-
-            power_response = requests.post(
-                power_url, params=params, cookies=login_response.cookies,
-                headers=headers, verify=False, timeout=300
-            )
-
-            if power_response.status_code != 200:
-                _LOGGER.debug(f"Legacy power data request on {self.host} failed: {power_response.status_code}")
-                return None
-
-            try:
-                root = ET.fromstring(power_response.text)
-                total_usage_elem = root.find('.//totalUsage')
-                if total_usage_elem is not None and total_usage_elem.text:
-                    return float(total_usage_elem.text)
-                _LOGGER.debug("Total usage data not found in legacy response from %s", self.host)
-                return None
-            except ET.ParseError as e:
-                _LOGGER.debug(f"Failed to parse legacy XML from {self.host}: {e}")
-                return None
-            except ValueError as e:
-                _LOGGER.debug(f"Failed to convert total usage to float from {self.host}: {e}")
-                return None
-
-        except Exception as e:
-            _LOGGER.debug(f"Error getting energy consumption via legacy endpoint on {self.host}: {e}")
-            return None
-        finally:
-            if st1 and st2 and login_response:
-                try:
-                    logout_url = f"{protocol}{self.host}/data/logout"
-                    requests.post(
-                        logout_url, params={"ST1": st1}, headers={"ST2": st2},
-                        cookies=login_response.cookies, verify=False, timeout=300
-                    )
-                except Exception as e:
-                    _LOGGER.debug(f"Legacy logout on {self.host} failed: {e}")
-    
     def get_energy_consumption_via_sysmgmt(self) -> float | None:
         """Get energy consumption using the proprietary /sysmgmt endpoint"""
-        login_response = None
-        try:
-            login_url = f"{protocol}{self.host}/sysmgmt/2015/bmc/session"
-            payload_and_headers = {"user": self.auth[0], "password": self.auth[1]}
-
-            login_response = requests.post(login_url, headers=payload_and_headers, data=payload_and_headers, verify=False, timeout=300)
-            login_headers = {'xsrf-token': login_response.headers['xsrf-token']}
-            if login_response.status_code == 404:
-                _LOGGER.info(
-                    "Legacy /sysmgmt endpoint not available on %s (HTTP 404) - disabling for future requests",
-                    self.host
-                )
-                self._sysmgmt_endpoint_supported = False
-                return None
-            auth_result = login_response.json()['authResult']
-            if auth_result != 0 or login_response.status_code != 201:
-                _LOGGER.debug(f"Sysmgmt login on {self.host} failed with status code: {auth_result}")
-                return None
-
-            power_url = f"{protocol}{self.host}/sysmgmt/2015/server/sensor/power"
-
-            power_response = requests.get(
-                power_url, cookies=login_response.cookies, headers=login_headers,
-                verify=False, timeout=300
-            )
+        from .legacy import get_energy_consumption_via_sysmgmt
+        return get_energy_consumption_via_sysmgmt(self)
 
-            if power_response.status_code != 200:
-                _LOGGER.debug(f"Sysmgmt power data request on {self.host} failed: {power_response.status_code}")
-                return None
+    def update_thermals(self) -> dict:
+        with self.profiler.span('update_thermals', system_id=self.system_id):
+            return self._single_flight(f'{self.system_id}_update_thermals', self._update_thermals)
 
-            try:
-                root = power_response.json()['root']
-                return float(root['powermonitordata']['cumReading']['totalUsage'])
-
-            except ET.ParseError as e:
-                _LOGGER.debug(f"Failed to parse legacy XML from {self.host}: {e}")
-                return None
-            except ValueError as e:
-                _LOGGER.debug(f"Failed to convert total usage to float from {self.host}: {e}")
-                return None
-
-        except Exception as e:
-            _LOGGER.debug(f"Error getting energy consumption via sysmgmt endpoint on {self.host}: {e}")
-            return None
-        finally:
-            if login_response:
-                try:
-                    logout_url = f"{protocol}{self.host}/sysmgmt/2015/bmc/session"
-                    requests.delete(
-                        logout_url, cookies=login_response.cookies, headers=login_headers, verify=False, timeout=300
-                    )
-                except Exception as e:
-                    _LOGGER.debug(f"Sysmgmt logout on {self.host} failed: {e}")
+    def update_status(self):
+        with self.profiler.span('update_status', system_id=self.system_id):
+            return self._single_flight(f'{self.system_id}_update_status', self._update_status)
+
+    def update_power_state(self) -> bool | None:
+        """Update the status from only the system's PowerState, bypassing the response cache."""
+        with self.profiler.span('update_power_state', system_id=self.system_id):
+            return self._single_flight(f'{self.system_id}_update_power_state', self._update_power_state)
+
+    def update_power_usage(self, energy_fallback: bool = True):
+        """Update the power usage, and the energy consumption when Redfish reports it.
+
+        When energy_fallback is False, the slow legacy endpoints are left for a separate
+        update_energy_consumption call so they can be scheduled with a lower priority.
+        """
+        with self.profiler.span('update_power_usage', system_id=self.system_id):
+            return self._single_flight(
+                f'{self.system_id}_update_power_usage_{energy_fallback}',
+                lambda: self._update_power_usage(energy_fallback)
+            )
 
-    def update_thermals(self) -> dict:
+    def update_power_reading(self) -> bool:
+        """Update the power usage over IPMI, whether it could be read; see update_power_resource for the rest."""
+        with self.profiler.span('update_power_reading', system_id=self.system_id):
+            return self._single_flight(f'{self.system_id}_update_power_reading', self._update_power_reading)
+
+    def update_power_resource(self):
+        """Update the power supplies, voltages and energy consumption, after update_power_reading read the power."""
+        with self.profiler.span('update_power_resource', system_id=self.system_id):
+            return self._single_flight(f'{self.system_id}_update_power_resource',
+                                       lambda: self._update_power_usage(False, power_read=True))
+
+    def power_resource_due(self) -> bool:
+        """Whether the Power resource should be read along with an IPMI power reading of this poll."""
+        read_at = self._power_resource_read_at
+        sampled_at = time.time() if self.sampled_at is None else self.sampled_at
+        return read_at is None or sampled_at - read_at >= POWER_RESOURCE_INTERVAL
+
+    def update_energy_consumption(self):
+        with self.profiler.span('update_energy_consumption', system_id=self.system_id):
+            return self._single_flight(f'{self.system_id}_update_energy_consumption',
+                                       self._update_energy_consumption)
+
+    def _update_thermals(self) -> dict:
+        path = self._path(drac_thermals)
         try:
-            req = self.get_path(drac_thermals)
+            req = self.get_path(path, conditional=True)
+            if req.status_code == 304:
+                # Nothing changed, the callbacks already have these values
+                self._sample(SAMPLE_THERMALS, self.thermal_values)
+                return self.thermal_values
             handle_error(req)
-            new_thermals = req.json()
+            with self.profiler.span('json_parse'):
+                new_thermals = req.json()
 
         except (RequestException, RedfishConfig, CannotConnect) as e:
             _LOGGER.debug(f"Couldn't update {self.host} thermals: {e}")
+            self.forget_etag(path)
             new_thermals = None
 
-        if new_thermals != self.thermal_values:
+        self._sample(SAMPLE_THERMALS, new_thermals)
+        with self.profiler.span('diff'):
+            changed = new_thermals != self.thermal_values
+        if changed:
             self.thermal_values = new_thermals
-            for callback in self.callback_thermals:
-                callback(self.thermal_values)
+            self._notify(self.callback_thermals, self.thermal_values)
         return self.thermal_values
 
-    def update_status(self):
+    def _update_status(self):
+        new_status = self._ipmi_call(lambda ipmi: ipmi.get_power_state())
+        if new_status is not None:
+            self.powered_off = not new_status
+            if new_status != self.status:
+                self.status = new_status
+                self._notify(self.callback_status, self.status)
+            return
+
+        path = self._path(drac_chassis_path)
         try:
-            result = self.get_path(drac_chassis_path)
+            result = self.get_path(path, conditional=True)
+            if result.status_code == 304:
+                return
             handle_error(result)
-            status_values = result.json()
+            with self.profiler.span('json_parse'):
+                status_values = result.json()
 
             try:
                 new_status = status_values[JSON_STATUS][JSON_STATUS_STATE] == 'Enabled'
@@ -337,72 +640,201 @@ class IdracRest:
 
         except (RequestException, RedfishConfig, CannotConnect) as e:
             _LOGGER.debug(f"Couldn't update {self.host} status: {e}")
+            self.forget_etag(path)
             new_status = None
 
+        self.powered_off = new_status is False
         if new_status != self.status:
             self.status = new_status
-            for callback in self.callback_status:
-                callback(self.status)
+            self._notify(self.callback_status, self.status)
 
-    def update_power_usage(self):
+    def get_power_state(self) -> str | None:
         try:
-            result = self.get_path(drac_powercontrol_path)
+            result = self.get_path(self._path(drac_system_path), max_age=0)
+        except RequestException:
+            raise CannotConnect(f"Could not get power state of {self.host}")
+
+        handle_error(result)
+
+        return result.json().get(JSON_POWER_STATE)
+
+    def _update_power_state(self) -> bool | None:
+        new_status = self._ipmi_call(lambda ipmi: ipmi.get_power_state())
+        if new_status is not None:
+            self.powered_off = not new_status
+            if new_status != self.status:
+                self.status = new_status
+                self._notify(self.callback_status, self.status)
+            return new_status
+
+        # Unknown until the PowerState was read, also when reading it raises
+        self.powered_off = False
+        try:
+            power_state = self.get_power_state()
+        except (RedfishConfig, CannotConnect) as e:
+            _LOGGER.debug(f"Couldn't update {self.host} power state: {e}")
+            return None
+
+        if power_state is None:
+            return None
+
+        new_status = power_state == 'On'
+        self.powered_off = not new_status
+        if new_status != self.status:
+            self.status = new_status
+            self._notify(self.callback_status, self.status)
+        return new_status
+
+    def _update_power_reading(self) -> bool:
+        power_usage = self._ipmi_call(lambda ipmi: ipmi.get_power_reading())
+        if power_usage is None:
+            return False
+        self._set_power_usage(power_usage)
+        if self._energy_from_redfish and not self.power_resource_due():
+            # The Power resource isn't read this poll, the energy consumption is still the last one read
+            self._sample(SAMPLE_ENERGY, self.energy_consumption)
+        return True
+
+    def _update_power_usage(self, energy_fallback: bool, power_read: bool = False):
+        """Update the power usage, energy consumption, power supplies and voltages from one Power request.
+
+        power_read leaves the power usage alone, as update_power_reading just read it over IPMI.
+        """
+        self._power_resource_read_at = time.time() if self.sampled_at is None else self.sampled_at
+
+        path = self._path(drac_power_path)
+        try:
+            result = self.get_path(path, conditional=True)
+            if result.status_code == 304:
+                # Nothing changed, the callbacks already have these values
+                if not power_read:
+                    self.failed_readings.discard(SAMPLE_POWER)
+                    self._sample(SAMPLE_POWER, self.power_usage)
+                if self._energy_from_redfish:
+                    self._sample(SAMPLE_ENERGY, self.energy_consumption)
+                elif energy_fallback:
+                    self._update_energy_consumption()
+                return
             handle_error(result)
-            power_values = result.json()
+            with self.profiler.span('json_parse'):
+                power_values = result.json()
             _LOGGER.debug(f"Power values response from {self.host}: {power_values}")
         except (RequestException, RedfishConfig, CannotConnect) as e:
             _LOGGER.debug(f"Couldn't update {self.host} power usage: {e}")
-            for callback in self.callback_power_usage:
-                callback(None)
+            self.forget_etag(path)
+            if not power_read:
+                self.failed_readings.add(SAMPLE_POWER)
+                self._sample(SAMPLE_POWER, None)
+                self._notify(self.callback_power_usage, None)
+            self.power_values = {}
+            self._notify(self.callback_power_supplies, None)
             return
 
+        with self.profiler.span('diff'):
+            changed = self._power_supplies(power_values) != self._power_supplies(self.power_values)
+        if changed:
+            self._notify(self.callback_power_supplies, power_values)
+        self.power_values = power_values
+        control = power_control(power_values)
+
         try:
-            new_power_usage = power_values[JSON_POWER_CONSUMED_WATTS]
-            if new_power_usage != self.power_usage:
-                self.power_usage = new_power_usage
-                for callback in self.callback_power_usage:
-                    callback(self.power_usage)
+            if not power_read:
+                self._set_power_usage(control[JSON_POWER_CONSUMED_WATTS])
         except:
-            pass
+            self.failed_readings.add(SAMPLE_POWER)
 
         # Try Redfish energy data first (available on newer firmware)
-        energy_updated = False
+        self._energy_from_redfish = False
         try:
-            power_metrics = power_values.get(JSON_POWER_METRICS)
+            power_metrics = control.get(JSON_POWER_METRICS)
             if power_metrics:
                 energy_kwh = power_metrics.get(JSON_ENERGY_CONSUMED_KWH)
                 if energy_kwh is not None:
                     energy_value = float(energy_kwh)
+                    self.failed_readings.discard(SAMPLE_ENERGY)
+                    self._sample(SAMPLE_ENERGY, energy_value)
                     if energy_value != self.energy_consumption:
                         self.energy_consumption = energy_value
-                        for callback in self.callback_energy_consumption:
-                            callback(self.energy_consumption)
-                    energy_updated = True
+                        self._notify(self.callback_energy_consumption, self.energy_consumption)
+                    self._energy_from_redfish = True
         except (KeyError, TypeError, ValueError) as e:
             _LOGGER.debug(f"Redfish energy data not available for {self.host}: {e}")
 
-        # Fall back to legacy /data endpoint if Redfish didn't provide energy data
-        if not energy_updated and self._legacy_endpoint_supported:
+        if energy_fallback:
+            self._update_energy_consumption()
+
+    def _set_power_usage(self, new_power_usage: int) -> None:
+        self.failed_readings.discard(SAMPLE_POWER)
+        self._sample(SAMPLE_POWER, new_power_usage)
+        if new_power_usage != self.power_usage:
+            self.power_usage = new_power_usage
+            self._notify(self.callback_power_usage, self.power_usage)
+
+    def _ipmi_call(self, call: Callable[[IpmiTransport], Any]) -> Any:
+        """The result of an IPMI call, None without IPMI or when it failed so Redfish is used instead."""
+        if self.ipmi is None:
+            return None
+        try:
+            with self.profiler.span('ipmi'):
+                return call(self.ipmi)
+        except CannotConnect as e:
+            _LOGGER.debug(f"Falling back to Redfish on {self.host}: {e}")
+            return None
+
+    @staticmethod
+    def _power_supplies(power_values: dict) -> tuple:
+        return power_values.get(JSON_POWER_SUPPLIES), power_values.get(JSON_VOLTAGES)
+
+    def _update_energy_consumption(self):
+        """Fall back to the legacy endpoints if Redfish didn't provide energy data."""
+        if self._energy_from_redfish:
+            return
+
+        if self._legacy_endpoint_supported:
             try:
                 energy_value = self.get_energy_consumption_via_data_endpoint()
+                self._energy_read(energy_value)
                 if energy_value is not None and energy_value != self.energy_consumption:
                     self.energy_consumption = energy_value
-                    for callback in self.callback_energy_consumption:
-                        callback(self.energy_consumption)
+                    self._notify(self.callback_energy_consumption, self.energy_consumption)
             except Exception as e:
+                self.failed_readings.add(SAMPLE_ENERGY)
                 _LOGGER.debug(f"Couldn't update {self.host} energy consumption via legacy endpoint: {e}")
             # Don't set callbacks to None if we just can't find the energy data
-        else:
+        elif self._sysmgmt_endpoint_supported:
             # There is still a way
             try:
                 energy_value = self.get_energy_consumption_via_sysmgmt()
+                self._energy_read(energy_value)
                 if energy_value is not None and energy_value != self.energy_consumption:
                     self.energy_consumption = energy_value
-                    for callback in self.callback_energy_consumption:
-                        callback(self.energy_consumption)
+                    self._notify(self.callback_energy_consumption, self.energy_consumption)
             except Exception as e:
+                self.failed_readings.add(SAMPLE_ENERGY)
                 _LOGGER.debug(f"Couldn't update {self.host} energy consumption via sysmgmt endpoint: {e}")
-            
+
+    def _energy_read(self, energy_value: float | None) -> None:
+        if energy_value is None:
+            self.failed_readings.add(SAMPLE_ENERGY)
+        else:
+            self.failed_readings.discard(SAMPLE_ENERGY)
+            self._sample(SAMPLE_ENERGY, energy_value)
+
+
+def _log_entry_id(entry: dict) -> int | None:
+    try:
+        return int(entry['Id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class _Flight:
+    """A fetch in progress, which other callers can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
 
 
 class CannotConnect(HomeAssistantError):
@@ -418,88 +850,25 @@ class RedfishConfig(HomeAssistantError):
 
 
 class IdracMock(IdracRest):
-    def __init__(self, host, username, password, interval):
-        super().__init__(host, username, password, interval)
-        self.is_on = True
-
-    def get_device_info(self):
-        return {
-            JSON_NAME: "Mock Device",
-            JSON_MANUFACTURER: "Mock Manufacturer",
-            JSON_MODEL: "Mock Model",
-            JSON_SERIAL_NUMBER: "Mock Serial"
-        }
-
-    def get_firmware_version(self):
-        return "1.0.0"
-
-    def idrac_reset(self, reset_type: str) -> Response | None:
-        if reset_type == 'On':
-            self.status = True
-        elif reset_type == 'GracefulShutdown':
-            self.status = False
-
-        time.sleep(3)
-        self.update_status()
-
-        return None
-
-    def update_thermals(self) -> dict:
-        new_thermals = {
-            'Fans': [
-                {
-                    'MemberId': "MemberID 1",
-                    'FanName': "First Mock Fan",
-                    'Reading': 1
-                },
-                {
-                    'MemberId': "MemberID 2",
-                    'FanName': "Second Mock Fan",
-                    'Reading': 2
-                }
-            ],
-            'Temperatures': [
-                {
-                    'MemberId': "MemberID 3",
-                    'Name': "Mock Temperature",
-                    'ReadingCelsius': 10
-                }
-            ]
-        }
-
-        if new_thermals != self.thermal_values:
-            self.thermal_values = new_thermals
-            for callback in self.callback_thermals:
-                callback(self.thermal_values)
-        return self.thermal_values
-
-    def update_status(self):
-        for callback in self.callback_status:
-            callback(self.status)
-
-    def update_power_usage(self):
-        power_values = {
-            JSON_POWER_CONSUMED_WATTS: 100,
-            JSON_POWER_METRICS: {
-                JSON_ENERGY_CONSUMED_KWH: 42.5
-            }
-        }
-        try:
-            new_power_usage = power_values[JSON_POWER_CONSUMED_WATTS]
-            if new_power_usage != self.power_usage:
-                self.power_usage = new_power_usage
-                for callback in self.callback_power_usage:
-                    callback(self.power_usage)
-                    
-            # Add energy consumption for mock
-            new_energy_consumption = power_values[JSON_POWER_METRICS][JSON_ENERGY_CONSUMED_KWH]
-            if new_energy_consumption != self.energy_consumption:
-                self.energy_consumption = new_energy_consumption
-                for callback in self.callback_energy_consumption:
-                    callback(self.energy_consumption)
-        except:
-            pass
-            
-    def get_energy_consumption_via_data_endpoint(self) -> float | None:
-        """Mock implementation of the data endpoint energy consumption method."""
-        return 42.5
+    """A client of a simulated fleet instead of an iDRAC, see simulator.py."""
+
+    def __init__(self, host, username, password, interval,
+                 system_id: str = DEFAULT_SYSTEM_ID, chassis_id: str = DEFAULT_CHASSIS_ID):
+        super().__init__(host, username, password, interval, system_id, chassis_id)
+        from .simulator import get_simulated_fleet
+        self.fleet = get_simulated_fleet(host)
+        # The simulated fleet isn't throttled, so a load test measures the integration rather than the limit
+        self.rate_limiter = get_rate_limiter(host, 0, 1)
+
+    def configure_rate_limit(self, rate: float, burst: int) -> None:
+        """Keep the simulated fleet unthrottled, whatever limit the entry has."""
+
+    def _request(self, method: str, url: str, priority: int = PRIORITY_POLL, **kwargs) -> Response:
+        with self.profiler.span('rate_limit'):
+            self.rate_limiter.acquire(priority)
+        with self.profiler.span('request', method=method, url=url):
+            return self.fleet.request(method, url, **kwargs)
+
+    def configure_ipmi(self, port: int) -> None:
+        from .simulator import SimulatedIpmiTransport
+        self.ipmi = SimulatedIpmiTransport(self.fleet, self.system_id, self.host, self.auth[0], self.auth[1], port)
@@ -0,0 +1,98 @@
+"""IPMI over LAN access to the iDRAC, for the power readings and power state Redfish is slow to report.
+
+A DCMI Get Power Reading answers in milliseconds, where a Redfish Power request can take seconds on
+iDRAC 7 and 8. The RMCP+ session stays open between polls, pyghmi keeps it alive.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any
+
+from .idrac_rest import CannotConnect
+
+_LOGGER = logging.getLogger(__name__)
+
+# Installed when an entry enables IPMI, see async_process_requirements in __init__.py
+REQUIREMENTS = ['pyghmi>=1.5']
+
+NETFN_CHASSIS = 0x00
+CMD_GET_CHASSIS_STATUS = 0x01
+NETFN_DCMI = 0x2C
+CMD_GET_POWER_READING = 0x02
+DCMI_GROUP_EXTENSION = 0xDC
+# System power statistics mode of the power reading request
+DCMI_SYSTEM_POWER_STATISTICS = 0x01
+# The bit of the reading state byte which is set while the BMC measures the power
+DCMI_POWER_MEASUREMENT_ACTIVE = 0x40
+# How long to only use Redfish after a command failed, logging in to an unreachable iDRAC takes seconds
+RECONNECT_DELAY = 60
+
+
+class IpmiTransport:
+    """A persistent RMCP+ session to the iDRAC, reconnecting on the next command after it failed."""
+
+    def __init__(self, host: str, username: str, password: str, port: int):
+        self.host = host
+        self.port = port
+        self._username = username
+        self._password = password
+
+        # pyghmi sessions aren't safe to share between threads
+        self._lock = threading.Lock()
+        self._session = None
+        self._failed_at: float | None = None
+
+    def get_power_reading(self) -> int | None:
+        """The system's current power in watts, None while the iDRAC isn't measuring it."""
+        data = self._raw_command(NETFN_DCMI, CMD_GET_POWER_READING,
+                                 (DCMI_GROUP_EXTENSION, DCMI_SYSTEM_POWER_STATISTICS, 0, 0))
+        # Group extension, current, minimum, maximum and average watts, timestamp, period and state
+        if len(data) < 18 or data[0] != DCMI_GROUP_EXTENSION or not data[17] & DCMI_POWER_MEASUREMENT_ACTIVE:
+            return None
+        return data[1] | data[2] << 8
+
+    def get_power_state(self) -> bool:
+        """Whether the system is powered on, from the chassis status."""
+        data = self._raw_command(NETFN_CHASSIS, CMD_GET_CHASSIS_STATUS)
+        return bool(data[0] & 0x01)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _raw_command(self, netfn: int, command: int, data: tuple = ()) -> list[int]:
+        with self._lock:
+            if self._failed_at is not None and time.monotonic() - self._failed_at < RECONNECT_DELAY:
+                raise CannotConnect(f"IPMI session to {self.host}:{self.port} failed less than {RECONNECT_DELAY}s ago")
+            try:
+                if self._session is None:
+                    self._session = self._connect()
+                response = self._session.raw_command(netfn=netfn, command=command, data=data)
+            except Exception as e:
+                # pyghmi raises IpmiException when the session broke, and socket errors
+                self._close()
+                self._failed_at = time.monotonic()
+                raise CannotConnect(f"IPMI request to {self.host}:{self.port} failed: {e}") from e
+            self._failed_at = None
+
+        if response.get('error'):
+            raise CannotConnect(f"IPMI command {netfn:#04x} {command:#04x} on {self.host} failed: "
+                                f"{response['error']}")
+        return list(response['data'])
+
+    def _connect(self) -> Any:
+        # Only loaded by the entries which use IPMI
+        from pyghmi.ipmi.command import Command
+
+        _LOGGER.debug(f"Opening an IPMI session to {self.host}:{self.port}")
+        return Command(bmc=self.host, userid=self._username, password=self._password, port=self.port)
+
+    def _close(self) -> None:
+        if self._session is not None:
+            try:
+                self._session.ipmi_session.logout()
+            except Exception as e:
+                _LOGGER.debug(f"Closing the IPMI session to {self.host} failed: {e}")
+            self._session = None
@@ -0,0 +1,220 @@
+"""The legacy /data and /sysmgmt energy endpoints, only imported by the iDRACs which use them."""
+from __future__ import annotations
+
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+from typing import TYPE_CHECKING, Iterable
+
+from .executor import PRIORITY_LEGACY
+
+if TYPE_CHECKING:
+    from .idrac_rest import IdracRest
+
+_LOGGER = logging.getLogger(__name__)
+
+protocol = 'https://'
+
+LEGACY_CHUNK_SIZE = 8192
+
+# The power graph is only read again after a gap this long between the successful reads, in seconds
+HISTORY_BACKFILL_GAP = 3600
+
+
+def get_energy_consumption_via_data_endpoint(rest: IdracRest) -> float | None:
+    """Get energy consumption using the legacy /data endpoint (pre-7.x firmware)."""
+    st1 = None
+    st2 = None
+    login_response = None
+    try:
+        login_url = f"{protocol}{rest.host}/data/login"
+        payload = {"user": rest.auth[0], "password": rest.auth[1]}
+
+        login_response = rest._request('POST', login_url, priority=PRIORITY_LEGACY, data=payload)
+        if login_response.status_code == 404:
+            _LOGGER.info(
+                "Legacy /data endpoint not available on %s (HTTP 404) - disabling for future requests",
+                rest.host
+            )
+            rest._legacy_endpoint_supported = False
+            return None
+        if login_response.status_code != 200:
+            _LOGGER.debug(f"Legacy login on {rest.host} failed with status code: {login_response.status_code}")
+            return None
+
+        match = re.search(r'ST1=([^,]+),ST2=([^<"]+)', login_response.text)
+        if not match:
+            _LOGGER.debug("Failed to extract authentication tokens from %s", rest.host)
+            return None
+
+        st1 = match.group(1)
+        st2 = match.group(2)
+
+        power_url = f"{protocol}{rest.host}/data"
+        # The power graph is by far the largest dataset, only ask for it when someone uses it and the
+        # readings since startup, or since the last read before a long gap, still have to be backfilled
+        read_at = rest._legacy_data_read_at
+        want_history = bool(rest.callback_power_history) and (
+            read_at is None or time.monotonic() - read_at > HISTORY_BACKFILL_GAP
+        )
+        params = {"get": "powermonitordata,powergraphdata" if want_history else "powermonitordata"}
+        headers = {"ST2": st2, "Content-Type": "application/x-www-form-urlencoded"}
+
+        power_response = rest._request(
+            'POST', power_url, priority=PRIORITY_LEGACY, params=params, cookies=login_response.cookies,
+            headers=headers, stream=True
+        )
+
+        try:
+            if power_response.status_code != 200:
+                _LOGGER.debug(f"Legacy power data request on {rest.host} failed: {power_response.status_code}")
+                return None
+            total_usage, history = parse_legacy_data(
+                power_response.iter_content(chunk_size=LEGACY_CHUNK_SIZE), want_history
+            )
+            if history:
+                rest._notify(rest.callback_power_history, history)
+            if total_usage is not None:
+                rest._legacy_data_read_at = time.monotonic()
+                return total_usage
+            _LOGGER.debug("Total usage data not found in legacy response from %s", rest.host)
+            return None
+        except ET.ParseError as e:
+            _LOGGER.debug(f"Failed to parse legacy XML from {rest.host}: {e}")
+            return None
+        except ValueError as e:
+            _LOGGER.debug(f"Failed to convert total usage to float from {rest.host}: {e}")
+            return None
+        finally:
+            # Drops the rest of the body when the parser stopped early
+            power_response.close()
+
+    except Exception as e:
+        _LOGGER.debug(f"Error getting energy consumption via legacy endpoint on {rest.host}: {e}")
+        return None
+    finally:
+        if st1 and st2 and login_response:
+            try:
+                logout_url = f"{protocol}{rest.host}/data/logout"
+                rest._request(
+                    'POST', logout_url, priority=PRIORITY_LEGACY, params={"ST1": st1}, headers={"ST2": st2},
+                    cookies=login_response.cookies
+                )
+            except Exception as e:
+                _LOGGER.debug(f"Legacy logout on {rest.host} failed: {e}")
+
+
+def get_energy_consumption_via_sysmgmt(rest: IdracRest) -> float | None:
+    """Get energy consumption using the proprietary /sysmgmt endpoint"""
+    login_response = None
+    try:
+        login_url = f"{protocol}{rest.host}/sysmgmt/2015/bmc/session"
+        payload_and_headers = {"user": rest.auth[0], "password": rest.auth[1]}
+
+        login_response = rest._request(
+            'POST', login_url, priority=PRIORITY_LEGACY, headers=payload_and_headers, data=payload_and_headers
+        )
+        if login_response.status_code == 404:
+            _LOGGER.info(
+                "Legacy /sysmgmt endpoint not available on %s (HTTP 404) - disabling for future requests",
+                rest.host
+            )
+            rest._sysmgmt_endpoint_supported = False
+            return None
+        login_headers = {'xsrf-token': login_response.headers['xsrf-token']}
+        auth_result = login_response.json()['authResult']
+        if auth_result != 0 or login_response.status_code != 201:
+            _LOGGER.debug(f"Sysmgmt login on {rest.host} failed with status code: {auth_result}")
+            return None
+
+        power_url = f"{protocol}{rest.host}/sysmgmt/2015/server/sensor/power"
+
+        power_response = rest._request(
+            'GET', power_url, priority=PRIORITY_LEGACY, cookies=login_response.cookies, headers=login_headers
+        )
+
+        if power_response.status_code != 200:
+            _LOGGER.debug(f"Sysmgmt power data request on {rest.host} failed: {power_response.status_code}")
+            return None
+
+        try:
+            root = power_response.json()['root']
+            return float(root['powermonitordata']['cumReading']['totalUsage'])
+
+        except ET.ParseError as e:
+            _LOGGER.debug(f"Failed to parse legacy XML from {rest.host}: {e}")
+            return None
+        except ValueError as e:
+            _LOGGER.debug(f"Failed to convert total usage to float from {rest.host}: {e}")
+            return None
+
+    except Exception as e:
+        _LOGGER.debug(f"Error getting energy consumption via sysmgmt endpoint on {rest.host}: {e}")
+        return None
+    finally:
+        if login_response:
+            try:
+                logout_url = f"{protocol}{rest.host}/sysmgmt/2015/bmc/session"
+                rest._request(
+                    'DELETE', logout_url, priority=PRIORITY_LEGACY, cookies=login_response.cookies,
+                    headers=login_headers
+                )
+            except Exception as e:
+                _LOGGER.debug(f"Sysmgmt logout on {rest.host} failed: {e}")
+
+
+def parse_legacy_data(chunks: Iterable[bytes],
+                      want_history: bool = True) -> tuple[float | None, list[tuple[str, float, float]]]:
+    """Pull the total usage and the power graph out of a legacy /data response in one pass.
+
+    The graph is returned as (graph, timestamp, watts) records, where graph is the name of the
+    element holding the record, as the iDRAC keeps graphs of several resolutions. Records are
+    dropped from the tree as soon as they are read, so the graph is never held as a whole.
+    Parsing stops as soon as everything wanted was read, the remaining chunks aren't consumed.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    total_usage = None
+    history = []
+    history_done = not want_history
+    path: list[str] = []
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                path.append(elem.tag)
+                continue
+            path.pop()
+
+            if elem.tag == 'totalUsage' and elem.text and total_usage is None:
+                total_usage = float(elem.text)
+            elif elem.tag == 'powergraphdata':
+                history_done = True
+            elif want_history and 'powergraphdata' in path and len(elem):
+                record = _power_graph_record(elem)
+                if record is not None:
+                    history.append((path[-1], *record))
+                    elem.clear()
+
+            if total_usage is not None and history_done:
+                return total_usage, history
+    parser.close()
+
+    return total_usage, history
+
+
+def _power_graph_record(elem: ET.Element) -> tuple[float, float] | None:
+    """Return the timestamp and watts of a power graph record, or None if elem isn't one."""
+    values = {child.tag.lower(): child.text for child in elem}
+    timestamp = next((values[tag] for tag in ('timestamp', 'time') if values.get(tag)), None)
+    reading = next((values[tag] for tag in ('reading', 'power', 'watts') if values.get(tag)), None)
+    try:
+        timestamp = float(timestamp)
+        reading = float(reading)
+    except (TypeError, ValueError):
+        return None
+    # Some firmware counts in milliseconds
+    if timestamp > 1e11:
+        timestamp /= 1000
+    return timestamp, reading
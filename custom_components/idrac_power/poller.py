@@ -0,0 +1,346 @@
+"""Polling of an iDRAC, on a fixed or adaptive interval and right after power actions."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from collections.abc import Collection
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from requests import Response
+
+from .adaptive import AdaptiveSchedule
+from .const import (DOMAIN, DATA_ALIGNED_POLLS, CONF_ALIGNED, CONF_EVENT_LOG, CONF_CAPABILITIES, CONF_INTERVAL,
+                    CONF_INTERVAL_DEFAULT, CONF_ADAPTIVE, CONF_INTERVAL_MIN, CONF_INTERVAL_MIN_DEFAULT,
+                    CONF_INTERVAL_MAX, CONF_INTERVAL_MAX_DEFAULT, CONF_DEADBAND, CONF_DEADBAND_DEFAULT,
+                    CONF_INTERVAL_OFF, CONF_INTERVAL_OFF_DEFAULT)
+from .eventlog import IdracLogReader
+from .executor import IdracExecutor, PRIORITY_POWER_ACTION, PRIORITY_POLL, PRIORITY_LEGACY
+from .idrac_rest import IdracRest, SAMPLE_POWER, SAMPLE_ENERGY, SAMPLE_THERMALS
+
+_LOGGER = logging.getLogger(__name__)
+
+METRIC_THERMALS = 'thermals'
+METRIC_STATUS = 'status'
+METRIC_POWER_USAGE = 'power_usage'
+METRIC_ENERGY_CONSUMPTION = 'energy_consumption'
+POLL_METRICS = [METRIC_THERMALS, METRIC_STATUS, METRIC_POWER_USAGE, METRIC_ENERGY_CONSUMPTION]
+
+PLAN_FULL = 'full'
+PLAN_OFF = 'off'
+
+# Delays between the PowerState polls which follow a power action, the last one repeats
+POWER_FOLLOW_UP_DELAYS = (1, 2, 3, 5, 8, 13, 20, 30)
+POWER_FOLLOW_UP_TIMEOUT = 600
+
+# The status each reset type ends in, the others are followed until the status changes
+POWER_ACTION_TARGETS = {
+    'On': True,
+    'ForceOn': True,
+    'ForceOff': False,
+    'GracefulShutdown': False,
+}
+
+
+class IdracPoller:
+    """Runs the background poll loop of a config entry, and the power actions on its server."""
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, rest: IdracRest, executor: IdracExecutor):
+        self.hass = hass
+        self.entry = entry
+        self.rest = rest
+        self.executor = executor
+
+        # Don't read an event log which the iDRAC turned out not to have
+        self.log_reader = None
+        if entry.data.get(CONF_EVENT_LOG) and entry.data.get(CONF_CAPABILITIES, {}).get('event_log') is not False:
+            self.log_reader = IdracLogReader(hass, entry, rest, executor)
+
+        self._task: asyncio.Task | None = None
+        self._follow_up_tasks: dict[str, asyncio.Task] = {}
+
+        # The adaptive intervals of each system's metrics, by system id
+        self.adaptive = entry.data.get(CONF_ADAPTIVE, False)
+        self._schedules: dict[str, AdaptiveSchedule] = {}
+        # Set to poll the adaptive schedules again before the next metric is due
+        self._wake = asyncio.Event()
+
+        # Powered off systems are polled at most this often, and when they were last, by system id
+        self.interval_off = entry.data.get(CONF_INTERVAL_OFF, CONF_INTERVAL_OFF_DEFAULT)
+        self._polled_off_at: dict[str, float] = {}
+        # When the event log was last read, it's read at most every interval_off while every system is off
+        self._log_read_at = -math.inf
+
+    def set_entry(self, entry: ConfigEntry) -> None:
+        """Poll on behalf of another entry sharing the connection, as the current one was unloaded."""
+        self.entry = entry
+        if self.log_reader is not None:
+            self.log_reader.entry = entry
+
+    def async_start(self) -> None:
+        self._task = self.hass.async_create_background_task(
+            self._async_refresh_sensors(), f"Update {self.entry.entry_id} iDRAC task"
+        )
+
+    def async_stop(self) -> None:
+        for task in (self._task, *self._follow_up_tasks.values()):
+            if task is not None:
+                task.cancel()
+
+    async def _async_refresh_sensors(self):
+        if self.adaptive:
+            await self._async_refresh_sensors_adaptive()
+        if self.entry.data.get(CONF_ALIGNED, False):
+            await self._async_refresh_sensors_aligned()
+
+        while True:
+            _LOGGER.debug("Refreshing sensors")
+            await self.async_update_all()
+            await asyncio.sleep(self.rest.interval)
+
+    async def _async_refresh_sensors_aligned(self):
+        """Poll on a wall-clock grid of the interval, shared by every aligned entry.
+
+        Samples taken in the same slot of the grid carry the same timestamp, so the totals over
+        several servers add up readings of the same moment. The polls of a slot share a bounded
+        number of turns, so a large fleet doesn't hit the network all at once.
+        """
+        semaphore = self.hass.data[DOMAIN][DATA_ALIGNED_POLLS]
+        while True:
+            interval = self.rest.interval
+            slot = (math.floor(time.time() / interval) + 1) * interval
+            await asyncio.sleep(slot - time.time())
+
+            async with semaphore:
+                _LOGGER.debug(f"Refreshing sensors of slot {slot}")
+                await self.async_update_all(slot)
+
+    async def _async_refresh_sensors_adaptive(self):
+        """Poll each metric of each system when its own interval is up, see AdaptiveSchedule.
+
+        The aligned option doesn't apply, as the intervals don't stay on a grid.
+        """
+        data = self.entry.data
+        now = time.monotonic()
+        for member in self.rest.members:
+            self._schedules[member.system_id] = AdaptiveSchedule(
+                POLL_METRICS,
+                data.get(CONF_INTERVAL, CONF_INTERVAL_DEFAULT),
+                data.get(CONF_INTERVAL_MIN, CONF_INTERVAL_MIN_DEFAULT),
+                data.get(CONF_INTERVAL_MAX, CONF_INTERVAL_MAX_DEFAULT),
+                data.get(CONF_DEADBAND, CONF_DEADBAND_DEFAULT) / 100,
+                METRIC_STATUS,
+                now
+            )
+
+        while True:
+            now = time.monotonic()
+            due = {member.system_id: self._schedules[member.system_id].due(now) for member in self.rest.members}
+            if any(due.values()):
+                _LOGGER.debug(f"Refreshing {due}")
+                await self.async_update_all(metrics=due)
+
+                now = time.monotonic()
+                for member in self.rest.members:
+                    schedule = self._schedules[member.system_id]
+                    schedule.observe({metric: self._reading(member, metric) for metric in due[member.system_id]},
+                                     now)
+                    if schedule.as_dict() != member.poll_intervals:
+                        member.poll_intervals = schedule.as_dict()
+                        member._notify(member.callback_poll_intervals, member.poll_intervals)
+                        member.dispatch_updates()
+
+            next_due = min(schedule.next_due() for schedule in self._schedules.values())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, next_due - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _reading(rest: IdracRest, metric: str):
+        """The reading of a metric which was just polled, None when it couldn't be read."""
+        if metric == METRIC_THERMALS:
+            return rest.thermal_values
+        if metric == METRIC_STATUS:
+            return rest.status
+        if metric == METRIC_POWER_USAGE:
+            return None if SAMPLE_POWER in rest.failed_readings else rest.power_usage
+        return None if SAMPLE_ENERGY in rest.failed_readings else rest.energy_consumption
+
+    async def async_update_all(self, sampled_at: float | None = None, metrics: dict[str, set[str]] | None = None):
+        """Poll every system of the entry concurrently, the executor bounds how many requests run at once.
+
+        metrics limits the poll to the given metrics of each system id, by default every metric is polled.
+        """
+        if sampled_at is None:
+            sampled_at = time.time()
+        with self.rest.profiler.poll(host=self.rest.host, sampled_at=sampled_at):
+            await asyncio.gather(*(
+                self._async_update_member(member, sampled_at,
+                                          POLL_METRICS if metrics is None else metrics[member.system_id])
+                for member in self.rest.members
+            ))
+            # Apply the whole poll to the entities at once
+            for member in self.rest.members:
+                member.dispatch_updates()
+
+        if self.log_reader is not None and self._log_due():
+            self._log_read_at = time.monotonic()
+            try:
+                await self.log_reader.async_update()
+            except Exception as e:
+                # ignore exceptions, just log the error
+                _LOGGER.warning(f"Reading {self.entry.entry_id} event log failed:\n{e}")
+
+    def _log_due(self) -> bool:
+        if any(self.poll_plan(member) != PLAN_OFF for member in self.rest.members):
+            return True
+        return time.monotonic() - self._log_read_at >= self.interval_off
+
+    @staticmethod
+    def poll_plan(rest: IdracRest) -> str:
+        """Which metrics of a system are polled: all of them, or only its power state and standby power.
+
+        Only a system known to be powered off gets the small plan, one whose power status couldn't be
+        read is polled in full.
+        """
+        return PLAN_OFF if rest.powered_off else PLAN_FULL
+
+    async def _async_update_member(self, rest: IdracRest, sampled_at: float, metrics: Collection[str]):
+        if not metrics:
+            return
+
+        if self.poll_plan(rest) == PLAN_OFF:
+            # The thermals of a powered off server don't change, and the legacy energy endpoints would
+            # log in to the web UI for nothing; only poll whether it's on yet, and its standby power
+            now = time.monotonic()
+            if now - self._polled_off_at.get(rest.system_id, -math.inf) < self.interval_off:
+                return
+            entering = rest.system_id not in self._polled_off_at
+            self._polled_off_at[rest.system_id] = now
+
+            rest.sampled_at = sampled_at
+            try:
+                await self.executor.async_submit(PRIORITY_POLL, rest.update_power_state)
+            except Exception as e:
+                # ignore exceptions, just log the error
+                _LOGGER.warning(f"Updating {self.entry.entry_id} power state failed:\n{e}")
+
+            if self.poll_plan(rest) == PLAN_OFF:
+                metrics = [METRIC_POWER_USAGE]
+                if entering:
+                    # Its thermals won't be polled until it's on, don't let the aggregates keep its inlet
+                    # temperature in the meantime
+                    rest._sample(SAMPLE_THERMALS, None)
+            else:
+                # It's on, poll the rest of the full plan right away
+                _LOGGER.debug(f"{rest.system_id} on {self.entry.entry_id} powered on, polling all of it again")
+                self._polled_off_at.pop(rest.system_id, None)
+                self._speed_up(rest)
+                metrics = [metric for metric in POLL_METRICS if metric != METRIC_STATUS]
+
+        rest.sampled_at = sampled_at
+
+        # The IPMI power reading takes milliseconds, show it before the slow Redfish requests of the poll
+        power_read = False
+        if METRIC_POWER_USAGE in metrics and rest.ipmi is not None:
+            try:
+                power_read = await self.executor.async_submit(PRIORITY_POLL, rest.update_power_reading)
+            except Exception as e:
+                # ignore exceptions, just log the error
+                _LOGGER.warning(f"Updating {self.entry.entry_id} power usage over IPMI failed:\n{e}")
+            if power_read:
+                rest.dispatch_updates()
+
+        if METRIC_THERMALS in metrics:
+            try:
+                await self.executor.async_submit(PRIORITY_POLL, rest.update_thermals)
+            except Exception as e:
+                # ignore exceptions, just log the error
+                _LOGGER.warning(f"Updating {self.entry.entry_id} thermals sensors failed:\n{e}")
+
+        if METRIC_STATUS in metrics:
+            try:
+                await self.executor.async_submit(PRIORITY_POLL, rest.update_status)
+            except Exception as e:
+                # ignore exceptions, just log the error
+                _LOGGER.warning(f"Updating {self.entry.entry_id} status sensor failed:\n{e}")
+
+        if METRIC_POWER_USAGE in metrics:
+            try:
+                if not power_read:
+                    await self.executor.async_submit(PRIORITY_POLL, rest.update_power_usage, False)
+                elif rest.power_resource_due():
+                    # Only the power supplies, voltages and energy are left, which change slowly
+                    await self.executor.async_submit(PRIORITY_LEGACY, rest.update_power_resource)
+            except Exception as e:
+                # ignore exceptions, just log the error
+                _LOGGER.warning(f"Updating {self.entry.entry_id} power usage failed:\n{e}")
+
+        if METRIC_ENERGY_CONSUMPTION in metrics:
+            try:
+                # Legacy logins are slow, so they should not hold up polls of other entities
+                await self.executor.async_submit(PRIORITY_LEGACY, rest.update_energy_consumption)
+            except Exception as e:
+                # ignore exceptions, just log the error
+                _LOGGER.warning(f"Updating {self.entry.entry_id} energy consumption failed:\n{e}")
+
+    async def async_power_action(self, reset_type: str, rest: IdracRest | None = None) -> Response | None:
+        """Perform an iDRAC reset on a system, the first one by default, then follow its power state."""
+        rest = rest or self.rest
+        previous_status = rest.status
+        response = await self.executor.async_submit(PRIORITY_POWER_ACTION, rest.idrac_reset, reset_type)
+
+        follow_up_task = self._follow_up_tasks.get(rest.system_id)
+        if follow_up_task is not None:
+            follow_up_task.cancel()
+        self._follow_up_tasks[rest.system_id] = self.hass.async_create_background_task(
+            self._async_follow_power_state(rest, reset_type, previous_status),
+            f"Follow {self.entry.entry_id} {rest.system_id} iDRAC power state"
+        )
+        return response
+
+    async def _async_follow_power_state(self, rest: IdracRest, reset_type: str, previous_status: bool | None):
+        """Poll only the PowerState, quickly at first and backing off, until it reaches its new state.
+
+        The regular poll loop keeps running on its own interval meanwhile.
+        """
+        target_status = POWER_ACTION_TARGETS.get(reset_type)
+        deadline = time.monotonic() + POWER_FOLLOW_UP_TIMEOUT
+        attempt = 0
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POWER_FOLLOW_UP_DELAYS[min(attempt, len(POWER_FOLLOW_UP_DELAYS) - 1)])
+            attempt += 1
+
+            try:
+                status = await self.executor.async_submit(PRIORITY_POWER_ACTION, rest.update_power_state)
+            except Exception as e:
+                _LOGGER.debug(f"Polling {rest.system_id} power state on {self.entry.entry_id} failed: {e}")
+                continue
+            rest.dispatch_updates()
+
+            if status is not None and (status == target_status if target_status is not None
+                                       else status != previous_status):
+                _LOGGER.debug(f"Power state of {rest.system_id} on {self.entry.entry_id} changed after "
+                              f"'{reset_type}' in {attempt} polls")
+                self._speed_up(rest)
+                if status:
+                    # Leave the powered off poll plan right away
+                    self._polled_off_at.pop(rest.system_id, None)
+                    await self._async_update_member(rest, time.time(), POLL_METRICS)
+                    rest.dispatch_updates()
+                return
+
+        _LOGGER.info(f"Power state of {rest.system_id} on {self.entry.entry_id} did not change within "
+                     f"{POWER_FOLLOW_UP_TIMEOUT}s after '{reset_type}'")
+
+    def _speed_up(self, rest: IdracRest) -> None:
+        """Poll every adaptive metric of a system which changed its power state at the minimum interval again."""
+        schedule = self._schedules.get(rest.system_id)
+        if schedule is not None:
+            # Everything else is about to change too
+            schedule.speed_up(time.monotonic())
+            self._wake.set()
@@ -0,0 +1,322 @@
+"""Sampled profiling of the polls, exported as a Chrome trace or as OpenTelemetry spans.
+
+A sampled poll records a span for each phase: the updates on the worker threads, the rate limiter,
+and every request broken down into DNS, TCP, TLS, sending, waiting for the BMC and downloading the
+body, the JSON parsing, the comparison with the previous values and the callback dispatch. The
+other polls only pay for checking that nothing is sampled.
+"""
+from __future__ import annotations
+
+import contextvars
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+TRACE_CHROME = 'chrome'
+TRACE_OTLP = 'otlp'
+TRACE_FORMATS = [TRACE_CHROME, TRACE_OTLP]
+
+# The spans kept until they're exported, the oldest ones are dropped beyond it
+MAX_SPANS = 20000
+
+# The sampled poll the code runs for, the executor carries it along to the jobs a poll submits
+_trace: contextvars.ContextVar[_PollTrace | None] = contextvars.ContextVar('idrac_power_trace', default=None)
+# The spans open on each thread, innermost last
+_local = threading.local()
+
+
+class PollProfiler:
+    """Records the spans of a sample of the polls of one iDRAC, shared by the clients of its systems."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sample_rate = 0.0
+        self._spans: deque[tuple] = deque(maxlen=MAX_SPANS)
+        self._polls = 0
+        self._sampled_polls = 0
+        # Maps the monotonic span times to the time since the epoch
+        self._epoch_offset = time.time_ns() - time.perf_counter_ns()
+
+    def configure(self, sample_rate: float, max_spans: int = MAX_SPANS) -> None:
+        """Sample this fraction of the polls from now on, 0 stops profiling and keeps what was recorded."""
+        self.sample_rate = sample_rate
+        if max_spans != self._spans.maxlen:
+            self._spans = deque(self._spans, maxlen=max_spans)
+
+    @property
+    def sampling(self) -> bool:
+        """Whether the code runs for a sampled poll of this profiler."""
+        trace = _trace.get()
+        return trace is not None and trace.profiler is self
+
+    def poll(self, **args) -> _PollTrace | _NoSpan:
+        """The root span of a poll, which samples the poll with the sample rate."""
+        if self.sample_rate <= 0:
+            return _NO_SPAN
+        self._polls += 1
+        if random.random() >= self.sample_rate:
+            return _NO_SPAN
+        self._sampled_polls += 1
+        return _PollTrace(self, args)
+
+    def span(self, name: str, **args) -> _Span | _NoSpan:
+        """A span of a phase of the sampled poll, nested in the span open on the same thread."""
+        trace = _trace.get()
+        if trace is None or trace.profiler is not self:
+            return _NO_SPAN
+        return _Span(self, trace, name, args)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+    def stats(self) -> dict:
+        return {
+            'sample_rate': self.sample_rate,
+            'polls': self._polls,
+            'sampled_polls': self._sampled_polls,
+            'spans': len(self._spans),
+            'max_spans': self._spans.maxlen,
+        }
+
+    def export(self, trace_format: str) -> dict:
+        """The recorded spans as a Chrome trace event file, or as OTLP/JSON resource spans."""
+        spans = list(self._spans)
+        if trace_format == TRACE_OTLP:
+            return self._export_otlp(spans)
+        return self._export_chrome(spans)
+
+    def _record(self, trace_id: int, span_id: int, parent_id: int | None, name: str, start: int, end: int,
+                args: dict) -> None:
+        thread = threading.current_thread()
+        self._spans.append((trace_id, span_id, parent_id, name, start, end, thread.ident, thread.name, args))
+
+    def _export_chrome(self, spans: list[tuple]) -> dict:
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f"iDRAC {self.name}"}}]
+        threads = {}
+        for trace_id, span_id, parent_id, name, start, end, thread_id, thread_name, args in spans:
+            threads[thread_id] = thread_name
+            events.append({
+                'name': name,
+                'cat': 'idrac_power',
+                'ph': 'X',
+                'ts': (start + self._epoch_offset) / 1000,
+                'dur': (end - start) / 1000,
+                'pid': pid,
+                'tid': thread_id,
+                'args': {**args, 'trace_id': f'{trace_id:032x}'},
+            })
+        events.extend({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id, 'args': {'name': thread_name}}
+                      for thread_id, thread_name in threads.items())
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def _export_otlp(self, spans: list[tuple]) -> dict:
+        return {'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': 'idrac_power', 'server.address': self.name})},
+            'scopeSpans': [{
+                'scope': {'name': __package__},
+                'spans': [
+                    {
+                        'traceId': f'{trace_id:032x}',
+                        'spanId': f'{span_id:016x}',
+                        **({'parentSpanId': f'{parent_id:016x}'} if parent_id is not None else {}),
+                        'name': name,
+                        # SPAN_KIND_INTERNAL
+                        'kind': 1,
+                        'startTimeUnixNano': str(start + self._epoch_offset),
+                        'endTimeUnixNano': str(end + self._epoch_offset),
+                        'attributes': _otlp_attributes({**args, 'thread.id': thread_id, 'thread.name': thread_name}),
+                    }
+                    for trace_id, span_id, parent_id, name, start, end, thread_id, thread_name, args in spans
+                ],
+            }],
+        }]}
+
+
+class _NoSpan:
+    """The span of a poll which isn't sampled, does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _PollTrace:
+    """The root span of a sampled poll, the spans on the worker threads are its children."""
+
+    def __init__(self, profiler: PollProfiler, args: dict):
+        self.profiler = profiler
+        self.args = args
+        self.trace_id = random.getrandbits(128)
+        self.span_id = random.getrandbits(64)
+        self.start = 0
+        self._token: contextvars.Token | None = None
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        # Only the poll's own task, the tasks it starts and the jobs it submits see the trace
+        self._token = _trace.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _trace.reset(self._token)
+        self.profiler._record(self.trace_id, self.span_id, None, 'poll', self.start, time.perf_counter_ns(),
+                              self.args)
+        return False
+
+
+class _Span:
+    __slots__ = ('profiler', 'trace', 'name', 'args', 'span_id', 'parent_id', 'start')
+
+    def __init__(self, profiler: PollProfiler, trace: _PollTrace, name: str, args: dict):
+        self.profiler = profiler
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        self.parent_id = parent.span_id if parent is not None and parent.trace is self.trace else self.trace.span_id
+        self.span_id = random.getrandbits(64)
+        self.start = time.perf_counter_ns()
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        _stack().pop()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.profiler._record(self.trace.trace_id, self.span_id, self.parent_id, self.name, self.start, end,
+                              self.args)
+        return False
+
+
+def _stack() -> list[_Span]:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _current_span(name: str) -> _Span | _NoSpan:
+    """A span in the profiler of the span open on this thread, for code which doesn't know the profiler."""
+    stack = _stack()
+    if not stack:
+        return _NO_SPAN
+    return stack[-1].profiler.span(name)
+
+
+def _record_interval(name: str, start: int) -> None:
+    """Record a span from start until now in the span open on this thread."""
+    stack = _stack()
+    if stack:
+        parent = stack[-1]
+        parent.profiler._record(parent.trace.trace_id, random.getrandbits(64), parent.span_id, name, start,
+                                time.perf_counter_ns(), {})
+
+
+def _otlp_attributes(values: dict[str, Any]) -> list[dict]:
+    attributes = []
+    for key, value in values.items():
+        if isinstance(value, bool):
+            attributes.append({'key': key, 'value': {'boolValue': value}})
+        elif isinstance(value, int):
+            attributes.append({'key': key, 'value': {'intValue': str(value)}})
+        elif isinstance(value, float):
+            attributes.append({'key': key, 'value': {'doubleValue': value}})
+        else:
+            attributes.append({'key': key, 'value': {'stringValue': str(value)}})
+    return attributes
+
+
+def profiled_request(method: str, url: str, stream: bool = False, **kwargs) -> requests.Response:
+    """requests.request, recording the phases of the connection and the request in the open span."""
+    with requests.Session() as session:
+        adapter = _ProfiledAdapter()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        response = session.request(method, url, stream=True, **kwargs)
+        if not stream:
+            with _current_span('download'):
+                # Read the body here like requests does when not streaming, a streaming caller reads it itself
+                response.content
+        return response
+
+
+class _ProfiledConnectionMixin:
+    def _new_conn(self) -> socket.socket:
+        host = self._dns_host
+        with _current_span('dns'):
+            try:
+                addresses = [info[4][0] for info in socket.getaddrinfo(host, self.port, type=socket.SOCK_STREAM)]
+            except OSError:
+                # Let urllib3 raise its own error
+                addresses = []
+
+        with _current_span('tcp'):
+            try:
+                for address in dict.fromkeys(addresses) or [host]:
+                    self._dns_host = address
+                    try:
+                        sock = super()._new_conn()
+                        break
+                    except Exception as e:
+                        error = e
+                else:
+                    raise error
+            finally:
+                self._dns_host = host
+        self._connected_at = time.perf_counter_ns()
+        return sock
+
+    def request(self, *args, **kwargs):
+        with _current_span('send'):
+            return super().request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        # Until the response headers arrive, mostly the BMC building the response
+        with _current_span('bmc'):
+            return super().getresponse(*args, **kwargs)
+
+
+class _ProfiledHTTPConnection(_ProfiledConnectionMixin, HTTPConnection):
+    pass
+
+
+class _ProfiledHTTPSConnection(_ProfiledConnectionMixin, HTTPSConnection):
+    def connect(self) -> None:
+        super().connect()
+        _record_interval('tls', self._connected_at)
+
+
+class _ProfiledHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _ProfiledHTTPConnection
+
+
+class _ProfiledHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _ProfiledHTTPSConnection
+
+
+class _ProfiledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _ProfiledHTTPConnectionPool,
+            'https': _ProfiledHTTPSConnectionPool,
+        }
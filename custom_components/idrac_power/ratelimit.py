@@ -0,0 +1,114 @@
+"""Per-host token bucket, which keeps the iDRAC's service processor from being overloaded."""
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+
+from .const import CONF_RATE_LIMIT_DEFAULT, CONF_RATE_BURST_DEFAULT
+from .executor import PRIORITY_NAMES
+
+_limiters: dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(host: str, rate: float | None = None, burst: int | None = None) -> TokenBucket:
+    """Return the rate limiter of a host, shared by every client talking to that iDRAC.
+
+    The limits are only changed when they are given; a new limiter starts with the defaults.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = TokenBucket(CONF_RATE_LIMIT_DEFAULT, CONF_RATE_BURST_DEFAULT)
+        if rate is not None and burst is not None:
+            limiter.configure(rate, burst)
+        return limiter
+
+
+class TokenBucket:
+    """Allows rate requests per second on average and bursts of up to burst requests.
+
+    Waiting requests are served by priority first and arrival second, so a power action
+    never queues behind a backlog of polls. A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiters: list[tuple[int, int]] = []
+        self._counter = itertools.count()
+
+        self._stats: dict[int, dict[str, float]] = {}
+
+    def configure(self, rate: float, burst: int) -> None:
+        with self._condition:
+            self._refill()
+            self.rate = rate
+            self.burst = max(1, burst)
+            self._tokens = min(self._tokens, self.burst)
+            self._condition.notify_all()
+
+    def acquire(self, priority: int) -> float:
+        """Block until a request may be sent, and return how long that took."""
+        start = time.monotonic()
+        with self._condition:
+            ticket = (priority, next(self._counter))
+            heapq.heappush(self._waiters, ticket)
+
+            while True:
+                self._refill()
+                if self._waiters[0] == ticket and (self.rate <= 0 or self._tokens >= 1):
+                    break
+                if self._waiters[0] == ticket:
+                    self._condition.wait((1 - self._tokens) / self.rate)
+                else:
+                    self._condition.wait()
+
+            heapq.heappop(self._waiters)
+            if self.rate > 0:
+                self._tokens -= 1
+            # Let the next waiter in line check whether it can go
+            self._condition.notify_all()
+
+            waited = time.monotonic() - start
+            stats = self._stats.setdefault(
+                priority, {'requests': 0, 'throttled': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+            )
+            stats['requests'] += 1
+            if waited > 0.001:
+                stats['throttled'] += 1
+            stats['wait_total'] += waited
+            stats['wait_max'] = max(stats['wait_max'], waited)
+            return waited
+
+    def stats(self) -> dict:
+        """Return how often and how long requests were throttled, per priority."""
+        with self._condition:
+            self._refill()
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(self._tokens, 2),
+                'waiting': len(self._waiters),
+                'requests': {
+                    PRIORITY_NAMES.get(priority, str(priority)): {
+                        'requests': int(stats['requests']),
+                        'throttled': int(stats['throttled']),
+                        'wait_avg': stats['wait_total'] / stats['requests'],
+                        'wait_max': stats['wait_max'],
+                    }
+                    for priority, stats in sorted(self._stats.items())
+                },
+            }
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
@@ -0,0 +1,85 @@
+"""The iDRAC connections of the loaded config entries, shared by the entries of the same BMC."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from homeassistant.util import slugify
+
+from .executor import IdracExecutor
+from .idrac_rest import IdracRest
+
+if TYPE_CHECKING:
+    from .poller import IdracPoller
+
+
+class IdracConnection:
+    """A client of one BMC with its executor, poll loop and time series stores, and the entries using it.
+
+    The poller runs on behalf of one of its entries, the other entries share its schedule. What the
+    connection stores, its aggregate sources, event log cursor and time series, is named by its key so it
+    doesn't depend on which entry that is.
+    """
+
+    def __init__(self, rest: IdracRest, executor: IdracExecutor, poller: IdracPoller, serial: str | None):
+        self.rest = rest
+        self.executor = executor
+        self.poller = poller
+        self.serial = serial
+        self.key = connection_key(rest.host, serial)
+        self.stores: dict = {}
+        self.entry_ids: set[str] = set()
+
+
+class IdracRegistry:
+    """Finds the connection of a BMC by its host, or by the serial of its chassis.
+
+    Entries added since the config flow checks the serial have it as their unique id, older
+    entries are only matched by their host. Only used from the event loop.
+    """
+
+    def __init__(self):
+        self._by_host: dict[str, IdracConnection] = {}
+        self._by_serial: dict[str, IdracConnection] = {}
+
+    def get(self, host: str, serial: str | None) -> IdracConnection | None:
+        connection = self._by_host.get(_host_key(host))
+        if connection is None and serial:
+            connection = self._by_serial.get(serial)
+        return connection
+
+    def add(self, entry_id: str, host: str, connection: IdracConnection) -> None:
+        """Let an entry use a connection, found by its host from now on."""
+        self._by_host.setdefault(_host_key(host), connection)
+        if connection.serial:
+            self._by_serial.setdefault(connection.serial, connection)
+        connection.entry_ids.add(entry_id)
+
+    def release(self, entry_id: str) -> IdracConnection | None:
+        """Stop an entry from using its connection, and return the connection if nothing uses it anymore."""
+        for connection in {*self._by_host.values(), *self._by_serial.values()}:
+            if entry_id in connection.entry_ids:
+                break
+        else:
+            return None
+
+        connection.entry_ids.discard(entry_id)
+        if connection.entry_ids:
+            return None
+        for index in (self._by_host, self._by_serial):
+            for key in [key for key, value in index.items() if value is connection]:
+                del index[key]
+        return connection
+
+
+def connection_key(host: str, serial: str | None) -> str:
+    """The name of what a BMC's connection stores, by its chassis serial when known."""
+    return slugify(serial or _host_key(host))
+
+
+def same_bmc(host: str, serial: str | None, other_host: str, other_serial: str | None) -> bool:
+    """Whether two entries would share a connection, the way IdracRegistry.get finds it."""
+    return _host_key(host) == _host_key(other_host) or bool(serial) and serial == other_serial
+
+
+def _host_key(host: str) -> str:
+    return host.strip().lower()
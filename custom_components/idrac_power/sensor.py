@@ -1,23 +1,35 @@
 """Platform for iDRAC power sensor integration."""
 from __future__ import annotations
 
-import asyncio
 import logging
+import time
+from typing import TYPE_CHECKING, Callable
 
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorEntity, 
     SensorEntityDescription, 
     SensorStateClass, 
     SensorDeviceClass
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.device_registry import DeviceEntryType
 from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.exceptions import PlatformNotReady
+from homeassistant.helpers.event import async_call_later
 
-from .const import (DOMAIN, DATA_IDRAC_REST_CLIENT, JSON_MODEL, JSON_MANUFACTURER, JSON_SERIAL_NUMBER, DATA_IDRAC_INFO,
-                    DATA_IDRAC_FIRMWARE, DATA_IDRAC_THERMAL)
-from .idrac_rest import IdracRest, CannotConnect, RedfishConfig
+from .aggregate import PowerAggregate, aggregate_source
+from .const import (DOMAIN, DATA_AGGREGATOR, DATA_TIMESERIES, CONF_GROUP, DATA_CONNECTION,
+                    RESTORE_MAX_INTERVALS, JSON_POWER_SUPPLIES, JSON_VOLTAGES, DATA_IDRAC_POLLER)
+from .device import IdracDevice, async_get_devices
+from .history import async_import_power_history
+from .idrac_rest import IdracRest, SAMPLE_POWER
+from .timing import timed_platform_setup
+
+if TYPE_CHECKING:
+    from .timeseries import TimeSeriesStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -27,82 +39,264 @@ drac_chassis_path = '/redfish/v1/Chassis/System.Embedded.1'
 drac_powercontrol_path = '/redfish/v1/Chassis/System.Embedded.1/Power/PowerControl'
 
 
+@timed_platform_setup('sensor')
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
     """Add iDRAC power sensor entry"""
-    rest_client = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_REST_CLIENT]
-
     _LOGGER.debug(f"Getting the REST client for {entry.entry_id}")
 
-    try:
-        if DATA_IDRAC_INFO not in hass.data[DOMAIN][entry.entry_id]:
-            info = await hass.async_add_executor_job(target=rest_client.get_device_info)
-            if not info:
-                raise PlatformNotReady(f"Could not set up: device didn't return anything.")
+    devices = await async_get_devices(hass, entry)
 
-            hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_INFO] = info
-        else:
-            info = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_INFO]
+    stores = hass.data[DOMAIN][entry.entry_id].get(DATA_TIMESERIES, {})
 
-        firmware_version = await hass.async_add_executor_job(target=rest_client.get_firmware_version)
-        if not firmware_version:
-            if DATA_IDRAC_FIRMWARE in hass.data[DOMAIN][entry.entry_id]:
-                firmware_version = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_FIRMWARE]
-        else:
-            hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_FIRMWARE] = firmware_version
-
-        thermal_info = await hass.async_add_executor_job(target=rest_client.update_thermals)
-        if not thermal_info:
-            if DATA_IDRAC_THERMAL in hass.data[DOMAIN][entry.entry_id]:
-                thermal_info = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_THERMAL]
-            else:
-                raise PlatformNotReady(f"Could not set up: couldn't get thermal info.")
-    except (CannotConnect, RedfishConfig) as e:
-        raise PlatformNotReady(str(e)) from e
-
-    model = info[JSON_MODEL]
-    name = model
-    manufacturer = info[JSON_MANUFACTURER]
-    serial = info[JSON_SERIAL_NUMBER]
-
-    device_info = DeviceInfo(
-        identifiers={(DOMAIN, serial)},
-        name=name,
-        manufacturer=manufacturer,
-        model=model,
-        sw_version=firmware_version,
-        serial_number=serial
-    )
+    # The sensors restore their last readings right away, without waiting for the iDRAC. Fans and
+    # temperatures which weren't there before are added once a poll returns them
+    entities = []
+    for device in devices:
+        entities.extend(_device_entities(hass, entry, device, device.rest.thermal_values, async_add_entities,
+                                         stores.get(device.rest.system_id)))
+
+    async_add_entities(entities)
+
+    if entry.data.get(CONF_GROUP):
+        @callback
+        def async_add_aggregate_entities(aggregates: list[PowerAggregate]):
+            """Add the sensors of the aggregates this entry claimed, now or when their entry was unloaded."""
+            aggregate_entities = []
+            for aggregate in aggregates:
+                _LOGGER.info("Adding aggregate sensors of %s", aggregate.name)
+                aggregate_device_info = DeviceInfo(
+                    identifiers={(DOMAIN, f"aggregate_{aggregate.name}")},
+                    name=f"iDRAC {aggregate.name}",
+                    entry_type=DeviceEntryType.SERVICE
+                )
+                aggregate_entities.extend([
+                    IdracAggregatePowerSensor(aggregate, aggregate_device_info),
+                    IdracAggregateEnergySensor(aggregate, aggregate_device_info),
+                    IdracAggregateInletTempSensor(aggregate, aggregate_device_info)
+                ])
+            async_add_entities(aggregate_entities)
+
+        aggregator = hass.data[DOMAIN][DATA_AGGREGATOR]
+        connection = hass.data[DOMAIN][entry.entry_id][DATA_CONNECTION]
+        aggregator.add_claimant(entry.entry_id, aggregate_source(connection.key, devices[0].rest),
+                                async_add_aggregate_entities)
+        # Its aggregate sensors are removed along with the platform, another entry of the group takes over
+        entry.async_on_unload(lambda: aggregator.remove_claimant(entry.entry_id))
+
+
+def _device_entities(hass, entry: ConfigEntry, device: IdracDevice, thermal_info: dict | None, async_add_entities,
+                     store: TimeSeriesStore | None) -> list[SensorEntity]:
+    """Create the sensors of a system, and add the thermal ones that appear later on."""
+    rest_client, device_info, serial, name = device.rest, device.device_info, device.serial, device.name
 
     _LOGGER.debug(f"Adding new devices to device info {('serial', serial)}")
 
     entities = [
-        IdracCurrentPowerSensor(hass, rest_client, device_info, f"{serial}_{name}_power", name),
+        IdracCurrentPowerSensor(hass, rest_client, device_info, f"{serial}_{name}_power", name, store),
         IdracEnergyConsumptionSensor(hass, rest_client, device_info, f"{serial}_{name}_energy", name)
     ]
+    # The poller of the connection decides, it may belong to another entry of the same BMC
+    if hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_POLLER].adaptive:
+        entities.append(IdracPollIntervalSensor(rest_client, device_info, f"{serial}_{name}_poll_interval", name))
+
+    known_members = set()
+    entities.extend(_new_thermal_entities(hass, rest_client, device_info, serial, name, thermal_info, known_members))
+    entities.extend(_registered_thermal_entities(hass, entry, rest_client, device_info, serial, name, known_members))
+
+    @callback
+    def async_reconcile_thermals(thermal: dict | None):
+        """Add entities for the fans and temperature sensors which appeared since the last poll.
+
+        The ones which disappeared mark themselves unavailable in their update_value.
+        """
+        new_entities = _new_thermal_entities(hass, rest_client, device_info, serial, name, thermal, known_members)
+        if new_entities:
+            async_add_entities(new_entities)
+
+    entry.async_on_unload(rest_client.register_callback_thermals(async_reconcile_thermals))
+
+    @callback
+    def async_reconcile_power_supplies(power: dict | None):
+        """Add entities for the power supplies and voltages, they're known after the first poll."""
+        new_entities = _new_power_supply_entities(hass, rest_client, device_info, serial, name, power, known_members)
+        if new_entities:
+            async_add_entities(new_entities)
+
+    entry.async_on_unload(rest_client.register_callback_power_supplies(async_reconcile_power_supplies))
+
+    return entities
+
 
-    for i, fan in enumerate(thermal_info['Fans']):
+def _new_thermal_entities(hass, rest_client: IdracRest, device_info, serial, name, thermal: dict | None,
+                          known_members: set) -> list[SensorEntity]:
+    """Create the fan and temperature entities of the thermal members not in known_members yet."""
+    entities = []
+    if not thermal:
+        return entities
+
+    for i, fan in enumerate(thermal.get('Fans', [])):
         member_id = fan['MemberId']
+        if ('fan', member_id) in known_members:
+            continue
+        known_members.add(('fan', member_id))
         _LOGGER.info("Adding fan %s : %s", i, fan["FanName"])
         entities.append(IdracFanSensor(hass, rest_client, device_info, f"{serial}_{name}_fan_{member_id}",
                                        f"{name} {fan['FanName']}", member_id,
                                        initial_reading=fan.get('Reading')
                                        ))
 
-    for i, temp in enumerate(thermal_info['Temperatures']):
+    for i, temp in enumerate(thermal.get('Temperatures', [])):
         member_id = temp['MemberId']
+        if ('temp', member_id) in known_members:
+            continue
+        known_members.add(('temp', member_id))
         _LOGGER.info("Adding temp %s : %s", i, temp["Name"])
         entities.append(IdracTempSensor(hass, rest_client, device_info, f"{serial}_{name}_temp_{member_id}",
                                         f"{name} {temp['Name']}", member_id,
                                         initial_reading=temp.get('ReadingCelsius')
                                         ))
 
-    async_add_entities(entities)
-
-
-class IdracCurrentPowerSensor(SensorEntity):
+    return entities
+
+
+def _registered_thermal_entities(hass, entry: ConfigEntry, rest_client: IdracRest, device_info, serial, name,
+                                 known_members: set) -> list[SensorEntity]:
+    """Create the fan and temperature entities registered before and not in known_members yet.
+
+    They restore their last reading until the first thermals poll, which marks the ones that are gone
+    unavailable.
+    """
+    entities = []
+    for registry_entry in er.async_entries_for_config_entry(er.async_get(hass), entry.entry_id):
+        if registry_entry.domain != 'sensor':
+            continue
+        for kind, sensor_class in (('fan', IdracFanSensor), ('temp', IdracTempSensor)):
+            prefix = f"{serial}_{name}_{kind}_"
+            if not registry_entry.unique_id.startswith(prefix):
+                continue
+            member_id = registry_entry.unique_id[len(prefix):]
+            if (kind, member_id) in known_members:
+                continue
+            known_members.add((kind, member_id))
+            _LOGGER.debug("Restoring %s %s", kind, member_id)
+            entities.append(sensor_class(hass, rest_client, device_info, registry_entry.unique_id,
+                                         registry_entry.original_name or f"{name} {member_id}", member_id))
+
+    return entities
+
+
+def _new_power_supply_entities(hass, rest_client: IdracRest, device_info, serial, name, power: dict | None,
+                               known_members: set) -> list[SensorEntity]:
+    """Create the power supply and voltage entities of the Power members not in known_members yet."""
+    entities = []
+    if not power:
+        return entities
+
+    for psu in power.get(JSON_POWER_SUPPLIES) or []:
+        member_id = psu['MemberId']
+        if ('psu', member_id) in known_members:
+            continue
+        known_members.add(('psu', member_id))
+        _LOGGER.info("Adding power supply %s", member_id)
+        entities.append(IdracPowerSupplySensor(hass, rest_client, device_info, f"{serial}_{name}_psu_{member_id}",
+                                               f"{name} {member_id} input power", member_id, psu))
+
+    for voltage in power.get(JSON_VOLTAGES) or []:
+        member_id = voltage['MemberId']
+        # Discrete sensors, like the power good ones, only report a status
+        if ('voltage', member_id) in known_members or voltage.get('ReadingVolts') is None:
+            continue
+        known_members.add(('voltage', member_id))
+        _LOGGER.info("Adding voltage %s", voltage['Name'])
+        entities.append(IdracVoltageSensor(hass, rest_client, device_info, f"{serial}_{name}_voltage_{member_id}",
+                                           f"{name} {voltage['Name']}", member_id,
+                                           initial_reading=voltage.get('ReadingVolts')
+                                           ))
+
+    return entities
+
+
+class IdracRestoreSensor(RestoreSensor):
+    """A sensor which starts with its last known reading, until a poll replaces it or it gets stale.
+
+    Measurements are stale RESTORE_MAX_INTERVALS poll intervals after they were sampled, then the
+    sensor is unavailable until the next poll. Counters never get stale, so restore_stale is off for them.
+    """
+
+    restore_stale = True
+    # Changes with every poll, it would make the recorder store the same reading again
+    _unrecorded_attributes = frozenset({'sampled_at', 'restored'})
+
+    rest: IdracRest
+
+    _restored_at: float | None = None
+    _unsub_stale: Callable[[], None] | None = None
+
+    @property
+    def extra_state_attributes(self):
+        if self._restored_at is not None:
+            return {'sampled_at': self._restored_at, 'restored': True}
+        return {'sampled_at': self.rest.sampled_at}
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if self._attr_native_value is not None:
+            return
+
+        last_state = await self.async_get_last_state()
+        last_data = await self.async_get_last_sensor_data()
+        if last_state is None or last_data is None or last_data.native_value is None:
+            return
+
+        sampled_at = last_state.attributes.get('sampled_at') or last_state.last_updated.timestamp()
+        if self.restore_stale:
+            remaining = sampled_at + RESTORE_MAX_INTERVALS * self.rest.interval - time.time()
+            if remaining <= 0:
+                _LOGGER.debug(f"Not restoring {self.entity_id}, its last reading is stale")
+                return
+            self._unsub_stale = async_call_later(self.hass, remaining, self._async_restored_stale)
+
+        self._attr_native_value = last_data.native_value
+        self._restored_at = sampled_at
+
+    async def async_will_remove_from_hass(self) -> None:
+        if self._unsub_stale is not None:
+            self._unsub_stale()
+            self._unsub_stale = None
+
+    @callback
+    def _async_restored_stale(self, _now) -> None:
+        self._unsub_stale = None
+        # A poll replaced the restored reading in the meantime
+        if self._restored_at is None:
+            return
+        _LOGGER.debug(f"Restored reading of {self.entity_id} is stale")
+        self._restored_at = None
+        self._attr_available = False
+        self.async_write_ha_state()
+
+    def _fresh_reading(self) -> None:
+        """Mark the reading as polled, called from update_value."""
+        self._restored_at = None
+
+    @callback
+    def _async_write_reading(self, value, available: bool) -> None:
+        """Write a polled reading, unless it's the one already written.
+
+        The thermals are polled as a whole, most of their entities get the same reading again.
+        """
+        if self._restored_at is None and (value, available) == (self._attr_native_value, self._attr_available):
+            return
+        self._fresh_reading()
+        self._attr_native_value = value
+        self._attr_available = available
+        self.async_write_ha_state()
+
+
+class IdracCurrentPowerSensor(IdracRestoreSensor):
     """The iDRAC's current power sensor entity."""
 
-    def __init__(self, hass, rest: IdracRest, device_info, unique_id, name):
+    def __init__(self, hass, rest: IdracRest, device_info, unique_id, name, store: TimeSeriesStore | None = None):
         self.hass = hass
         self.rest = rest
 
@@ -120,19 +314,47 @@ class IdracCurrentPowerSensor(SensorEntity):
         self._attr_has_entity_name = True
 
         self._attr_native_value = None
+        self._store = store
 
-        self.rest.register_callback_power_usage(self.update_value)
-
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if self._store is None:
+            self.async_on_remove(self.rest.register_callback_power_usage(self.update_value))
+        else:
+            # The store keeps every sample, the state only gets the mean of every minute
+            listeners = self._store.listeners[SAMPLE_POWER]
+            listeners.append(self.update_mean)
+            self.async_on_remove(lambda: listeners.remove(self.update_mean))
+            self.async_on_remove(self.rest.register_callback_power_usage(self.update_availability))
+        self.async_on_remove(self.rest.register_callback_power_history(self.update_history))
+
+    @callback
     def update_value(self, new_value: int | None):
+        self._fresh_reading()
         if new_value is not None:
             self._attr_native_value = new_value
             self._attr_available = True
         else:
             self._attr_available = False
-        self.schedule_update_ha_state()
+        self.async_write_ha_state()
 
+    @callback
+    def update_mean(self, mean: float):
+        self.update_value(round(mean, 1))
 
-class IdracFanSensor(SensorEntity):
+    @callback
+    def update_availability(self, new_value: int | None):
+        if new_value is None:
+            self.update_value(None)
+
+    @callback
+    def update_history(self, records: list[tuple[str, float, float]]):
+        """Backfill the statistics with the iDRAC's power graph, for the time we weren't polling."""
+        if self.entity_id is not None:
+            self.hass.async_create_task(async_import_power_history(self.hass, self.entity_id, records))
+
+
+class IdracFanSensor(IdracRestoreSensor):
     def __init__(self, hass, rest: IdracRest, device_info, unique_id, name, member_id, initial_reading=None):
         self.hass = hass
         self.rest = rest
@@ -152,21 +374,24 @@ class IdracFanSensor(SensorEntity):
         self._attr_native_value = initial_reading
         self.member_id = member_id
 
-        self.rest.register_callback_thermals(self.update_value)
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self.rest.register_callback_thermals(self.update_value))
 
+    @callback
     def update_value(self, thermal: dict | None):
+        value, available = self._attr_native_value, False
         if thermal:
             for fan in thermal['Fans']:
                 if fan['MemberId'] == self.member_id:
-                    self._attr_native_value = fan['Reading']
+                    value = fan['Reading']
+                    # A fan that was removed is unavailable until it's back
+                    available = True
                     break
-            self._attr_available = True
-        else:
-            self._attr_available = False
-        self.schedule_update_ha_state()
+        self._async_write_reading(value, available)
 
 
-class IdracTempSensor(SensorEntity):
+class IdracTempSensor(IdracRestoreSensor):
     def __init__(self, hass, rest: IdracRest, device_info, unique_id, name, member_id, initial_reading=None):
         self.hass = hass
         self.rest = rest
@@ -186,23 +411,118 @@ class IdracTempSensor(SensorEntity):
         self._attr_native_value = initial_reading
         self.member_id = member_id
 
-        self.rest.register_callback_thermals(self.update_value)
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self.rest.register_callback_thermals(self.update_value))
 
+    @callback
     def update_value(self, thermal: dict | None):
+        value, available = self._attr_native_value, False
         if thermal:
             for temp in thermal['Temperatures']:
                 if temp['MemberId'] == self.member_id:
-                    self._attr_native_value = temp['ReadingCelsius']
+                    value = temp['ReadingCelsius']
+                    # A sensor that was removed is unavailable until it's back
+                    available = True
                     break
-            self._attr_available = True
-        else:
-            self._attr_available = False
-        self.schedule_update_ha_state()
+        self._async_write_reading(value, available)
+
+
+class IdracPowerSupplySensor(IdracRestoreSensor):
+    """The input power of a power supply, with its health and output power as attributes."""
+
+    def __init__(self, hass, rest: IdracRest, device_info, unique_id, name, member_id, psu: dict):
+        self.hass = hass
+        self.rest = rest
+
+        self.entity_description = SensorEntityDescription(
+            key='psu_input_power',
+            name=name,
+            icon='mdi:power-plug',
+            native_unit_of_measurement='W',
+            device_class=SensorDeviceClass.POWER,
+            state_class=SensorStateClass.MEASUREMENT
+        )
+
+        self._attr_device_info = device_info
+        self._attr_unique_id = unique_id
+        self._attr_has_entity_name = True
+        self._attr_native_value = psu.get('PowerInputWatts')
+        self.member_id = member_id
+        self._psu = psu
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self.rest.register_callback_power_supplies(self.update_value))
+
+    @property
+    def extra_state_attributes(self):
+        status = self._psu.get('Status') or {}
+        return {
+            **super().extra_state_attributes,
+            'health': status.get('Health'),
+            'state': status.get('State'),
+            'output_power': self._psu.get('PowerOutputWatts'),
+            'line_input_voltage': self._psu.get('LineInputVoltage'),
+        }
+
+    @callback
+    def update_value(self, power: dict | None):
+        self._fresh_reading()
+        self._attr_available = False
+        if power:
+            for psu in power.get(JSON_POWER_SUPPLIES) or []:
+                if psu['MemberId'] == self.member_id:
+                    self._psu = psu
+                    self._attr_native_value = psu.get('PowerInputWatts')
+                    # A power supply that was pulled is unavailable until it's back
+                    self._attr_available = True
+                    break
+        self.async_write_ha_state()
+
+
+class IdracVoltageSensor(IdracRestoreSensor):
+    def __init__(self, hass, rest: IdracRest, device_info, unique_id, name, member_id, initial_reading=None):
+        self.hass = hass
+        self.rest = rest
+
+        self.entity_description = SensorEntityDescription(
+            key='voltage',
+            name=name,
+            icon='mdi:sine-wave',
+            native_unit_of_measurement='V',
+            device_class=SensorDeviceClass.VOLTAGE,
+            state_class=SensorStateClass.MEASUREMENT
+        )
 
+        self._attr_device_info = device_info
+        self._attr_unique_id = unique_id
+        self._attr_has_entity_name = True
+        self._attr_native_value = initial_reading
+        self.member_id = member_id
 
-class IdracEnergyConsumptionSensor(SensorEntity):
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self.rest.register_callback_power_supplies(self.update_value))
+
+    @callback
+    def update_value(self, power: dict | None):
+        self._fresh_reading()
+        self._attr_available = False
+        if power:
+            for voltage in power.get(JSON_VOLTAGES) or []:
+                if voltage['MemberId'] == self.member_id:
+                    self._attr_native_value = voltage.get('ReadingVolts')
+                    self._attr_available = True
+                    break
+        self.async_write_ha_state()
+
+
+class IdracEnergyConsumptionSensor(IdracRestoreSensor):
     """The iDRAC's energy consumption sensor entity."""
 
+    restore_stale = False
+
     def __init__(self, hass, rest: IdracRest, device_info, unique_id, name):
         self.hass = hass
         self.rest = rest
@@ -222,12 +542,139 @@ class IdracEnergyConsumptionSensor(SensorEntity):
 
         self._attr_native_value = None
 
-        self.rest.register_callback_energy_consumption(self.update_value)
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self.rest.register_callback_energy_consumption(self.update_value))
 
+    @callback
     def update_value(self, new_value: float | None):
+        self._fresh_reading()
         if new_value is not None:
             self._attr_native_value = new_value
             self._attr_available = True
         else:
             self._attr_available = False
-        self.schedule_update_ha_state()
+        self.async_write_ha_state()
+
+
+class IdracPollIntervalSensor(SensorEntity):
+    """The shortest adaptive poll interval of a system, with the interval of each metric as attributes."""
+
+    _attr_should_poll = False
+
+    def __init__(self, rest: IdracRest, device_info, unique_id, name):
+        self.rest = rest
+
+        self.entity_description = SensorEntityDescription(
+            key='poll_interval',
+            name=f"{name} poll interval",
+            icon='mdi:timer-sync-outline',
+            native_unit_of_measurement='s',
+            device_class=SensorDeviceClass.DURATION,
+            entity_category=EntityCategory.DIAGNOSTIC
+        )
+
+        self._attr_device_info = device_info
+        self._attr_unique_id = unique_id
+        self._attr_has_entity_name = True
+
+    @property
+    def native_value(self):
+        return min(self.rest.poll_intervals.values(), default=None)
+
+    @property
+    def extra_state_attributes(self):
+        return self.rest.poll_intervals
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self.rest.register_callback_poll_intervals(self.update_value))
+
+    @callback
+    def update_value(self, _intervals: dict[str, float]):
+        self.async_write_ha_state()
+
+
+class IdracAggregateSensor(SensorEntity):
+    """A total over the iDRACs of a group, which updates whenever one of them reports a sample."""
+
+    _attr_should_poll = False
+
+    def __init__(self, aggregate: PowerAggregate, device_info, description: SensorEntityDescription):
+        self.aggregate = aggregate
+
+        self.entity_description = description
+
+        self._attr_device_info = device_info
+        self._attr_unique_id = f"aggregate_{aggregate.name}_{description.key}"
+        self._attr_has_entity_name = True
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            'hosts': self.aggregate.sources,
+            'sampled_at': self.aggregate.sampled_at,
+        }
+
+    async def async_added_to_hass(self) -> None:
+        self.aggregate.listeners.append(self.async_write_ha_state)
+
+    async def async_will_remove_from_hass(self) -> None:
+        self.aggregate.listeners.remove(self.async_write_ha_state)
+
+
+class IdracAggregatePowerSensor(IdracAggregateSensor):
+    def __init__(self, aggregate: PowerAggregate, device_info):
+        super().__init__(aggregate, device_info, SensorEntityDescription(
+            key='power_usage',
+            name=f"{aggregate.name} power usage",
+            icon='mdi:lightning-bolt',
+            native_unit_of_measurement='W',
+            device_class=SensorDeviceClass.POWER,
+            state_class=SensorStateClass.MEASUREMENT
+        ))
+
+    @property
+    def native_value(self):
+        return self.aggregate.power
+
+
+class IdracAggregateEnergySensor(IdracAggregateSensor, RestoreSensor):
+    def __init__(self, aggregate: PowerAggregate, device_info):
+        super().__init__(aggregate, device_info, SensorEntityDescription(
+            key='energy_consumption',
+            name=f"{aggregate.name} energy consumption",
+            icon='mdi:lightning-bolt-circle',
+            native_unit_of_measurement='kWh',
+            device_class=SensorDeviceClass.ENERGY,
+            state_class=SensorStateClass.TOTAL_INCREASING
+        ))
+
+    async def async_added_to_hass(self) -> None:
+        # Continue counting from the last total, so it doesn't reset on every restart. After a reload the
+        # aggregate still holds that total
+        if not self.aggregate.energy_restored:
+            self.aggregate.energy_restored = True
+            last_data = await self.async_get_last_sensor_data()
+            if last_data is not None and isinstance(last_data.native_value, (int, float)):
+                self.aggregate.energy += last_data.native_value
+        await super().async_added_to_hass()
+
+    @property
+    def native_value(self):
+        return round(self.aggregate.energy, 3)
+
+
+class IdracAggregateInletTempSensor(IdracAggregateSensor):
+    def __init__(self, aggregate: PowerAggregate, device_info):
+        super().__init__(aggregate, device_info, SensorEntityDescription(
+            key='max_inlet_temp',
+            name=f"{aggregate.name} max inlet temperature",
+            icon='mdi:thermometer',
+            native_unit_of_measurement='°C',
+            device_class=SensorDeviceClass.TEMPERATURE,
+            state_class=SensorStateClass.MEASUREMENT
+        ))
+
+    @property
+    def native_value(self):
+        return self.aggregate.inlet_temperature
@@ -0,0 +1,197 @@
+"""Integration-wide services of the iDRAC power monitor."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+
+import voluptuous as vol
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (DOMAIN, DATA_IDRAC_REST_CLIENT, DATA_IDRAC_POLLER, DATA_TIMESERIES, HOST,
+                    SERVICE_BULK_POWER_ACTION, SERVICE_QUERY_TIMESERIES, ATTR_CONFIG_ENTRY_IDS, ATTR_RESET_TYPE,
+                    ATTR_MAX_CONCURRENCY, ATTR_STAGGER, ATTR_CONFIG_ENTRY_ID, ATTR_SYSTEM_ID, ATTR_METRIC, ATTR_START,
+                    ATTR_END, ATTR_RESOLUTION, RESET_TYPES, SERVICE_PROFILE_POLLS, ATTR_SAMPLE_RATE, ATTR_MAX_SPANS,
+                    SERVICE_EXPORT_TRACE, ATTR_FORMAT, ATTR_CLEAR, TIMESERIES_METRICS, RESOLUTIONS, RESOLUTION_MINUTE)
+from .profiling import MAX_SPANS, TRACE_FORMATS, TRACE_CHROME
+
+_LOGGER = logging.getLogger(__name__)
+
+BULK_POWER_ACTION_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_IDS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Required(ATTR_RESET_TYPE): vol.In(RESET_TYPES),
+        vol.Optional(ATTR_MAX_CONCURRENCY, default=4): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(ATTR_STAGGER, default=5): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    }
+)
+
+QUERY_TIMESERIES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_SYSTEM_ID): cv.string,
+        vol.Required(ATTR_METRIC): vol.In(TIMESERIES_METRICS),
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_RESOLUTION, default=RESOLUTION_MINUTE): vol.In(RESOLUTIONS),
+    }
+)
+
+PROFILE_POLLS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_SAMPLE_RATE, default=0.1): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+        vol.Optional(ATTR_MAX_SPANS, default=MAX_SPANS): vol.All(vol.Coerce(int), vol.Range(min=100)),
+    }
+)
+
+EXPORT_TRACE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_FORMAT, default=TRACE_CHROME): vol.In(TRACE_FORMATS),
+        vol.Optional(ATTR_CLEAR, default=False): cv.boolean,
+    }
+)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def async_bulk_power_action(call: ServiceCall) -> ServiceResponse:
+        entries = _get_loaded_entries(hass, call.data.get(ATTR_CONFIG_ENTRY_IDS))
+        reset_type = call.data[ATTR_RESET_TYPE]
+        stagger = call.data[ATTR_STAGGER]
+
+        semaphore = asyncio.Semaphore(call.data[ATTR_MAX_CONCURRENCY])
+        started_at = time.monotonic()
+        results = []
+
+        async def async_power_action(entry, rest):
+            start = time.monotonic()
+            result = {
+                'config_entry_id': entry.entry_id,
+                'title': entry.title,
+                'host': entry.data[HOST],
+                'system_id': rest.system_id,
+                'started': round(start - started_at, 3),
+            }
+            try:
+                poller = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_POLLER]
+                response = await poller.async_power_action(reset_type, rest)
+                result['success'] = response is None or response.status_code < 400
+                if response is not None:
+                    result['status_code'] = response.status_code
+            except Exception as e:
+                _LOGGER.warning(f"Bulk '{reset_type}' on {entry.data[HOST]} failed: {e}")
+                result['success'] = False
+                result['error'] = str(e) or type(e).__name__
+            finally:
+                result['duration'] = round(time.monotonic() - start, 3)
+                results.append(result)
+                semaphore.release()
+
+        # Start the actions one by one, at least stagger seconds apart, so the servers don't all draw
+        # their inrush current at once, and with no more than max_concurrency of them in flight
+        tasks = []
+        next_start = time.monotonic()
+        # Entries of the same BMC share their client, act on each of its systems only once
+        acted = set()
+        for entry in entries:
+            for rest in hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_REST_CLIENT].members:
+                if id(rest) in acted:
+                    continue
+                acted.add(id(rest))
+                await semaphore.acquire()
+                delay = next_start - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(hass.async_create_task(async_power_action(entry, rest)))
+                next_start = time.monotonic() + stagger
+        await asyncio.gather(*tasks)
+
+        return {
+            'reset_type': reset_type,
+            'duration': round(time.monotonic() - started_at, 3),
+            'results': sorted(results, key=lambda result: result['started']),
+        }
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_BULK_POWER_ACTION, async_bulk_power_action,
+        schema=BULK_POWER_ACTION_SCHEMA, supports_response=SupportsResponse.OPTIONAL
+    )
+
+    async def async_query_timeseries(call: ServiceCall) -> ServiceResponse:
+        entry = _get_loaded_entries(hass, [call.data[ATTR_CONFIG_ENTRY_ID]])[0]
+        stores = hass.data[DOMAIN][entry.entry_id].get(DATA_TIMESERIES)
+        if not stores:
+            raise HomeAssistantError(f"iDRAC config entry {entry.title} doesn't keep a time series")
+
+        system_id = call.data.get(ATTR_SYSTEM_ID, next(iter(stores)))
+        if system_id not in stores:
+            raise HomeAssistantError(f"iDRAC config entry {entry.title} has no system {system_id}")
+
+        end = dt_util.as_timestamp(call.data[ATTR_END]) if ATTR_END in call.data else time.time()
+        start = dt_util.as_timestamp(call.data[ATTR_START]) if ATTR_START in call.data else end - 3600
+
+        return await hass.async_add_executor_job(
+            stores[system_id].query, call.data[ATTR_METRIC], start, end, call.data[ATTR_RESOLUTION]
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_QUERY_TIMESERIES, async_query_timeseries,
+        schema=QUERY_TIMESERIES_SCHEMA, supports_response=SupportsResponse.ONLY
+    )
+
+    async def async_profile_polls(call: ServiceCall) -> None:
+        entry = _get_loaded_entries(hass, [call.data[ATTR_CONFIG_ENTRY_ID]])[0]
+        profiler = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_REST_CLIENT].profiler
+        profiler.configure(call.data[ATTR_SAMPLE_RATE], call.data[ATTR_MAX_SPANS])
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE_POLLS, async_profile_polls, schema=PROFILE_POLLS_SCHEMA
+    )
+
+    async def async_export_trace(call: ServiceCall) -> ServiceResponse:
+        entry = _get_loaded_entries(hass, [call.data[ATTR_CONFIG_ENTRY_ID]])[0]
+        profiler = hass.data[DOMAIN][entry.entry_id][DATA_IDRAC_REST_CLIENT].profiler
+        trace_format = call.data[ATTR_FORMAT]
+        stats = profiler.stats()
+        trace = profiler.export(trace_format)
+        if call.data[ATTR_CLEAR]:
+            profiler.clear()
+
+        path = hass.config.path(f"{DOMAIN}_trace_{entry.entry_id}_{int(time.time())}.{trace_format}.json")
+        await hass.async_add_executor_job(_write_json, path, trace)
+        return {'path': path, **stats}
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_EXPORT_TRACE, async_export_trace,
+        schema=EXPORT_TRACE_SCHEMA, supports_response=SupportsResponse.OPTIONAL
+    )
+
+
+def _write_json(path: str, data: dict) -> None:
+    with open(path, 'w') as file:
+        json.dump(data, file)
+
+
+def _get_loaded_entries(hass: HomeAssistant, entry_ids: list[str] | None) -> list:
+    """Return the given config entries, or all loaded ones of this integration."""
+    if entry_ids is None:
+        return [entry for entry in hass.config_entries.async_entries(DOMAIN)
+                if entry.state is ConfigEntryState.LOADED]
+
+    entries = []
+    for entry_id in entry_ids:
+        entry = hass.config_entries.async_get_entry(entry_id)
+        if entry is None or entry.domain != DOMAIN:
+            raise HomeAssistantError(f"{entry_id} is not an iDRAC config entry")
+        if entry.state is not ConfigEntryState.LOADED:
+            raise HomeAssistantError(f"iDRAC config entry {entry.title} is not loaded")
+        entries.append(entry)
+    return entries
@@ -0,0 +1,317 @@
+"""A simulated fleet of servers answering Redfish requests, to load test the integration.
+
+A host of MOCK simulates an iDRAC with a single system, MOCK:<count> one with count systems, each
+of which gets its own device. MOCK:<count>:<n> is the n-th of many such iDRACs, so a fleet of them can
+be added as separate entries. The readings follow a random walk, requests take a random time and
+some fail, and power actions take a while to complete, like on real hardware. With the ipmi
+option, the first system also answers the IPMI commands, much quicker than its Redfish API.
+"""
+from __future__ import annotations
+
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+
+from requests import Response
+from requests.exceptions import ConnectionError
+
+from .ipmi import (IpmiTransport, NETFN_CHASSIS, CMD_GET_CHASSIS_STATUS, NETFN_DCMI, CMD_GET_POWER_READING,
+                   DCMI_GROUP_EXTENSION, DCMI_POWER_MEASUREMENT_ACTIVE)
+
+# The median and spread of the response times, in seconds
+LATENCY_MEDIAN = 0.08
+LATENCY_SIGMA = 0.6
+LATENCY_MAX = 2
+LATENCY_IPMI = 0.005
+FAILURE_RATE = 0.01
+# How long a power action takes to complete, in seconds
+TRANSITION_TIME = (3, 15)
+
+# Model, fans, temperature sensors, idle and maximum watts
+MODELS = (
+    ('PowerEdge R640', [f'Fan{i}{rotor}' for i in range(1, 9) for rotor in 'AB'],
+     ['System Board Inlet Temp', 'System Board Exhaust Temp', 'CPU1 Temp', 'CPU2 Temp'], 110, 550),
+    ('PowerEdge R740xd', [f'Fan{i}{rotor}' for i in range(1, 7) for rotor in 'AB'],
+     ['System Board Inlet Temp', 'System Board Exhaust Temp', 'CPU1 Temp', 'CPU2 Temp'], 150, 750),
+    ('PowerEdge R7525', [f'Fan{i}{rotor}' for i in range(1, 7) for rotor in 'AB'],
+     ['System Board Inlet Temp', 'System Board Exhaust Temp', 'CPU1 Temp', 'CPU2 Temp',
+      'PCIe Riser 1 Temp', 'PCIe Riser 2 Temp'], 180, 1100),
+    ('PowerEdge C6420', [f'Fan{i}' for i in range(1, 5)],
+     ['System Board Inlet Temp', 'CPU1 Temp', 'CPU2 Temp'], 90, 400),
+)
+
+_fleets: dict[str, SimulatedFleet] = {}
+_fleets_lock = threading.Lock()
+
+
+def get_simulated_fleet(host: str) -> SimulatedFleet:
+    """Return the simulated fleet of a mock host, which keeps its state across reloads."""
+    with _fleets_lock:
+        fleet = _fleets.get(host)
+        if fleet is None:
+            _, count, n = (host.split(':', 2) + ['', ''])[:3]
+            try:
+                count = max(1, int(count))
+            except ValueError:
+                count = 1
+            seed = zlib.crc32(host.encode())
+            # Every mock host gets its own serials, so the config flow doesn't take them for the same server
+            serial_prefix = f'MOCK{seed & 0xFFFF:04X}' + (f'N{n}' if n else '')
+            fleet = _fleets[host] = SimulatedFleet(count, seed, serial_prefix)
+        return fleet
+
+
+class SimulatedSystem:
+    """A server whose load and inlet temperature drift, and the readings which follow from them."""
+
+    def __init__(self, index: int, rng: random.Random, serial_prefix: str):
+        self.system_id = f'System.Embedded.{index}'
+        self.serial = f'{serial_prefix}{index:04d}'
+        self.model, self.fans, self.temperatures, self.idle_watts, self.max_watts = MODELS[(index - 1) % len(MODELS)]
+
+        self.on = True
+        self.pending: tuple[bool, float] | None = None
+        self.load = rng.random()
+        self.inlet = rng.gauss(22, 1.5)
+        self.energy = rng.uniform(100, 5000)
+        self.updated = time.monotonic()
+
+    @property
+    def watts(self) -> int:
+        return round(self.idle_watts + self.load * (self.max_watts - self.idle_watts)) if self.on else 0
+
+    def step(self, rng: random.Random) -> None:
+        """Move the readings on by the time passed since the last step."""
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+
+        self.energy += self.watts * elapsed / 3_600_000
+        if self.pending is not None and now >= self.pending[1]:
+            self.on = self.pending[0]
+            self.pending = None
+
+        # The steps of a random walk grow with the square root of the time between them
+        scale = math.sqrt(min(elapsed, 3600) / 60)
+        self.load = min(1.0, max(0.0, self.load + rng.gauss(0, 0.05 * scale)))
+        self.inlet = min(35.0, max(15.0, self.inlet + rng.gauss(0, 0.2 * scale)))
+
+    def power(self, rng: random.Random) -> dict:
+        # Two redundant supplies sharing the load, at 94% efficiency
+        line_voltage = 230 + rng.gauss(0, 1.5)
+        return {
+            'PowerControl': [{
+                'MemberId': 'PowerControl',
+                'PowerConsumedWatts': self.watts,
+                'PowerMetrics': {'EnergyConsumedKWh': round(self.energy, 3)},
+            }],
+            'PowerSupplies': [
+                {
+                    'MemberId': f'PSU.Slot.{slot}',
+                    'Name': f'PS{slot} Status',
+                    'PowerInputWatts': round(self.watts / 2 / 0.94),
+                    'PowerOutputWatts': round(self.watts / 2),
+                    'LineInputVoltage': round(line_voltage),
+                    'Status': {'Health': 'OK', 'State': 'Enabled'},
+                }
+                for slot in (1, 2)
+            ],
+            'Voltages': [
+                *({
+                    'MemberId': f'iDRAC.Embedded.1#PS{slot}Voltage{slot}',
+                    'Name': f'PS{slot} Voltage {slot}',
+                    'ReadingVolts': round(line_voltage),
+                } for slot in (1, 2)),
+                # Discrete sensors only report a status
+                {
+                    'MemberId': 'iDRAC.Embedded.1#CPU1VCOREPG',
+                    'Name': 'CPU1 VCORE PG',
+                    'ReadingVolts': None,
+                    'Status': {'Health': 'OK', 'State': 'Enabled'},
+                },
+            ],
+        }
+
+    def thermal(self, rng: random.Random) -> dict:
+        heat = self.load if self.on else 0
+        fan_speed = 3000 + 9000 * heat + 100 * (self.inlet - 22)
+        temperatures = []
+        for name in self.temperatures:
+            if 'Inlet' in name:
+                reading = self.inlet
+            elif 'Exhaust' in name:
+                reading = self.inlet + 5 + 15 * heat
+            else:
+                reading = self.inlet + 10 + 50 * heat + rng.gauss(0, 1)
+            temperatures.append({
+                'MemberId': f'iDRAC.Embedded.1#{name.replace(" ", "")}',
+                'Name': name,
+                'ReadingCelsius': round(reading),
+            })
+        return {
+            'Fans': [
+                {
+                    'MemberId': f'0x17||Fan.Embedded.{fan}',
+                    'FanName': f'System Board {fan}',
+                    'Reading': round(fan_speed + rng.gauss(0, 60), -1) if self.on else 0,
+                    'ReadingUnits': 'RPM',
+                }
+                for fan in self.fans
+            ],
+            'Temperatures': temperatures,
+        }
+
+
+class SimulatedFleet:
+    """The systems behind a simulated iDRAC, answering requests the way the iDRAC's Redfish API does."""
+
+    def __init__(self, count: int, seed: int, serial_prefix: str):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.systems = {system.system_id: system for system in
+                        (SimulatedSystem(index, self._rng, serial_prefix) for index in range(1, count + 1))}
+        self._log: list[dict] = []
+
+    def request(self, method: str, url: str, headers: dict | None = None, json: dict | None = None,
+                params: dict | None = None, **_kwargs) -> Response:
+        """Answer a request after a random latency, or fail it like a flaky network would."""
+        with self._lock:
+            latency = min(LATENCY_MAX, self._rng.lognormvariate(math.log(LATENCY_MEDIAN), LATENCY_SIGMA))
+            failed = self._rng.random() < FAILURE_RATE
+        time.sleep(latency)
+        if failed:
+            raise ConnectionError(f"Simulated connection failure for {url}")
+
+        path = '/' + url.split('://', 1)[-1].split('/', 1)[-1].split('?', 1)[0]
+        with self._lock:
+            status_code, body = self._handle(method, path, json or {}, params or {})
+        return _response(url, status_code, body, headers or {})
+
+    def _handle(self, method: str, path: str, body: dict, params: dict) -> tuple[int, dict | None]:
+        if method == 'GET' and path == '/redfish/v1/Managers/iDRAC.Embedded.1':
+            return 200, {'FirmwareVersion': '7.00.00.00'}
+        if method == 'GET' and path == '/redfish/v1/Managers/iDRAC.Embedded.1/LogServices/Sel/Entries':
+            skip, top = int(params.get('$skip', 0)), int(params.get('$top', 50))
+            newest_first = self._log[::-1]
+            return 200, {'Members': newest_first[skip:skip + top], 'Members@odata.count': len(self._log)}
+        if method == 'GET' and path == '/redfish/v1/Systems':
+            return 200, {'Members': [{'@odata.id': f'/redfish/v1/Systems/{system_id}'} for system_id in self.systems]}
+
+        match = re.fullmatch(r'/redfish/v1/(Systems|Chassis)/([^/]+)(/.*)?', path)
+        system = self.systems.get(match.group(2)) if match else None
+        if system is None:
+            return 404, {'error': {'code': 'Base.1.0.GeneralError',
+                                   '@Message.ExtendedInfo': [{'Message': f'{path} not found'}]}}
+        system.step(self._rng)
+        collection, resource = match.group(1), match.group(3) or ''
+
+        if method == 'POST' and collection == 'Systems' and resource == '/Actions/ComputerSystem.Reset':
+            return self._reset(system, body.get('ResetType'))
+        if method != 'GET':
+            return 405, {'error': {'code': 'Base.1.0.GeneralError',
+                                   '@Message.ExtendedInfo': [{'Message': f'{method} not allowed'}]}}
+
+        if collection == 'Systems' and not resource:
+            return 200, {
+                'PowerState': 'On' if system.on else 'Off',
+                'Links': {'Chassis': [{'@odata.id': f'/redfish/v1/Chassis/{system.system_id}'}]},
+            }
+        if collection == 'Chassis' and not resource:
+            return 200, {
+                'Name': 'Computer System Chassis',
+                'Manufacturer': 'Dell Inc.',
+                'Model': system.model,
+                'SerialNumber': system.serial,
+                'Status': {'State': 'Enabled' if system.on else 'StandbyOffline'},
+            }
+        if collection == 'Chassis' and resource == '/Power':
+            return 200, system.power(self._rng)
+        if collection == 'Chassis' and resource == '/Thermal':
+            return 200, system.thermal(self._rng)
+        return 404, {'error': {'code': 'Base.1.0.GeneralError',
+                               '@Message.ExtendedInfo': [{'Message': f'{path} not found'}]}}
+
+    def _reset(self, system: SimulatedSystem, reset_type: str | None) -> tuple[int, dict | None]:
+        target = {'On': True, 'ForceOn': True, 'ForceOff': False, 'GracefulShutdown': False,
+                  'PushPowerButton': not system.on, 'ForceRestart': True}.get(reset_type)
+        if target is None and reset_type != 'Nmi':
+            return 400, {'error': {'code': 'Base.1.0.ActionParameterNotSupported',
+                                   '@Message.ExtendedInfo': [{'Message': f'Unknown ResetType {reset_type}'}]}}
+        if target is not None and target == system.on and reset_type != 'ForceRestart':
+            return 409, {'error': {'code': 'Base.1.0.GeneralError',
+                                   '@Message.ExtendedInfo': [{'Message': 'Server is already in that state.'}]}}
+
+        if target is not None:
+            system.pending = (target, time.monotonic() + self._rng.uniform(*TRANSITION_TIME))
+        self._log.append({
+            'Id': str(len(self._log) + 1),
+            'Created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'Severity': 'OK',
+            'Message': f"A {reset_type} power action was requested on {system.system_id}.",
+            'MessageId': 'SYS1003',
+        })
+        return 204, None
+
+
+class SimulatedIpmiTransport(IpmiTransport):
+    """An IPMI transport whose session is answered by a system of the simulated fleet."""
+
+    def __init__(self, fleet: SimulatedFleet, system_id: str, *args):
+        super().__init__(*args)
+        self.fleet = fleet
+        self.system_id = system_id
+
+    def _connect(self) -> SimulatedBmc:
+        return SimulatedBmc(self.fleet, self.fleet.systems[self.system_id])
+
+
+class SimulatedBmc:
+    """Answers raw IPMI commands the way pyghmi's Command returns the iDRAC's answers."""
+
+    def __init__(self, fleet: SimulatedFleet, system: SimulatedSystem):
+        self.fleet = fleet
+        self.system = system
+        # pyghmi logs out through the Command's session
+        self.ipmi_session = self
+
+    def raw_command(self, netfn: int, command: int, data: tuple = ()) -> dict:
+        time.sleep(LATENCY_IPMI)
+        with self.fleet._lock:
+            self.system.step(self.fleet._rng)
+            watts = self.system.watts
+            on = self.system.on
+
+        if (netfn, command) == (NETFN_DCMI, CMD_GET_POWER_READING) and data[:1] == (DCMI_GROUP_EXTENSION,):
+            # The current, minimum, maximum and average watts over the last second
+            statistics = struct.pack('<HHHHII', watts, watts, watts, watts, int(time.time()), 1000)
+            reading = [DCMI_GROUP_EXTENSION, *statistics, DCMI_POWER_MEASUREMENT_ACTIVE]
+            return {'netfn': netfn + 1, 'command': command, 'code': 0, 'data': reading}
+        if (netfn, command) == (NETFN_CHASSIS, CMD_GET_CHASSIS_STATUS):
+            return {'netfn': netfn + 1, 'command': command, 'code': 0, 'data': [int(on), 0, 0]}
+        return {'netfn': netfn + 1, 'command': command, 'code': 0xC1, 'error': 'Invalid command', 'data': []}
+
+    def logout(self) -> None:
+        pass
+
+
+def _response(url: str, status_code: int, body: dict | None, headers: dict) -> Response:
+    content = json.dumps(body).encode() if body is not None else b''
+
+    response = Response()
+    response.url = url
+    response.encoding = 'utf-8'
+    response.status_code = status_code
+    response.headers['Content-Type'] = 'application/json'
+    if status_code == 200:
+        etag = f'"{zlib.crc32(content):08x}"'
+        response.headers['ETag'] = etag
+        if headers.get('If-None-Match') == etag:
+            response.status_code = 304
+            content = b''
+    response._content = content
+    return response
@@ -0,0 +1,244 @@
+"""Compact on-disk store of every power and thermal sample, with downsampled tiers.
+
+Each metric of a system is kept in memory-mapped ring files of fixed-width records: one with the
+raw samples and one per tier of downsampled buckets. Once a ring file is full, the oldest records
+are overwritten, so the store never grows.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+from typing import Callable, Iterator
+
+from .aggregate import inlet_temperature
+from .const import (SAMPLE_THERMALS, SAMPLE_INLET_TEMPERATURE, TIMESERIES_METRICS, RESOLUTION_RAW,
+                    RESOLUTION_MINUTE, RESOLUTION_HOUR)
+from .executor import IdracExecutor, PRIORITY_LEGACY
+
+_LOGGER = logging.getLogger(__name__)
+
+# A day of 5 second samples, a week of minutes and a year of hours
+RAW_CAPACITY = 17280
+TIERS = ((RESOLUTION_MINUTE, 60, 10080), (RESOLUTION_HOUR, 3600, 8760))
+
+_MAGIC = b'IDTS'
+_VERSION = 2
+# magic, version, record size, capacity, index of the next record, number of records
+_HEADER = struct.Struct('<4sHHIII')
+# timestamp, value; doubles, as the energy counters need all their digits to tell two samples apart
+_RAW_RECORD = struct.Struct('<dd')
+# bucket start, mean, min, max, number of samples
+_TIER_RECORD = struct.Struct('<ddddI')
+
+
+class RingFile:
+    """A memory-mapped file of fixed-width records, ordered by their leading timestamp."""
+
+    def __init__(self, path: str, record: struct.Struct, capacity: int):
+        self.record = record
+        self.capacity = capacity
+
+        size = _HEADER.size + record.size * capacity
+        exists = os.path.exists(path) and os.path.getsize(path) == size
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+        magic, version, record_size, capacity, self._head, self._count = _HEADER.unpack_from(self._map)
+        if (magic, version, record_size, capacity) != (_MAGIC, _VERSION, record.size, self.capacity):
+            if exists:
+                _LOGGER.warning(f"Discarding {path}, it has an unknown format")
+            self._head = self._count = 0
+            self._write_header()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, *values) -> None:
+        self.record.pack_into(self._map, _HEADER.size + self._head * self.record.size, *values)
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self._write_header()
+
+    def pop(self) -> tuple:
+        """Remove and return the newest record."""
+        record = self[self._count - 1]
+        self._head = (self._head - 1) % self.capacity
+        self._count -= 1
+        self._write_header()
+        return record
+
+    def __getitem__(self, index: int) -> tuple:
+        """Return the record at index, counting from the oldest one."""
+        slot = (self._head - self._count + index) % self.capacity
+        return self.record.unpack_from(self._map, _HEADER.size + slot * self.record.size)
+
+    def range(self, start: float, end: float) -> Iterator[tuple]:
+        """Return the records with a timestamp from start up to end."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle][0] < start:
+                low = middle + 1
+            else:
+                high = middle
+        for index in range(low, self._count):
+            record = self[index]
+            if record[0] >= end:
+                break
+            yield record
+
+    def close(self) -> None:
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+    def _write_header(self) -> None:
+        _HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, self.record.size, self.capacity, self._head, self._count)
+
+
+class _Tier:
+    """Downsamples the samples into buckets of width seconds."""
+
+    def __init__(self, ring: RingFile, width: int):
+        self.ring = ring
+        self.width = width
+
+        self._bucket: float | None = None
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self._count = 0
+
+    def add(self, timestamp: float, value: float) -> tuple | None:
+        """Add a sample, and return the record of the bucket this completed, if any."""
+        bucket = math.floor(timestamp / self.width) * self.width
+        completed = None
+        if self._bucket is None and len(self.ring) and self.ring[len(self.ring) - 1][0] == bucket:
+            # Continue the bucket that was stored when the store was closed
+            _, mean, self._min, self._max, self._count = self.ring.pop()
+            self._sum = mean * self._count
+        elif self._bucket is not None and bucket != self._bucket:
+            completed = self.flush()
+
+        self._bucket = bucket
+        self._sum += value
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+        self._count += 1
+        return completed
+
+    def flush(self) -> tuple | None:
+        if not self._count:
+            return None
+        record = (self._bucket, self._sum / self._count, self._min, self._max, self._count)
+        self.ring.append(*record)
+        self._sum, self._min, self._max, self._count = 0.0, math.inf, -math.inf, 0
+        return record
+
+
+class TimeSeriesStore:
+    """The samples of one system, fed by IdracRest.callback_samples.
+
+    The samples arrive on the event loop, and are written to the files in batches on the executor.
+    """
+
+    def __init__(self, directory: str, executor: IdracExecutor):
+        os.makedirs(directory, exist_ok=True)
+        self._executor = executor
+        # The samples waiting to be written, by the task writing them
+        self._pending: list[tuple[str, float, float]] = []
+        self._write_task: asyncio.Task | None = None
+
+        self._lock = threading.Lock()
+        self._raw: dict[str, RingFile] = {}
+        self._tiers: dict[str, list[tuple[str, _Tier]]] = {}
+        for metric in TIMESERIES_METRICS:
+            self._raw[metric] = RingFile(os.path.join(directory, f"{metric}.{RESOLUTION_RAW}"),
+                                         _RAW_RECORD, RAW_CAPACITY)
+            self._tiers[metric] = [
+                (name, _Tier(RingFile(os.path.join(directory, f"{metric}.{name}"), _TIER_RECORD, capacity), width))
+                for name, width, capacity in TIERS
+            ]
+
+        # Called with the mean of every completed bucket of the first tier
+        self.listeners: dict[str, list[Callable[[float], None]]] = {metric: [] for metric in TIMESERIES_METRICS}
+
+    def add_sample(self, metric: str, value, sampled_at: float) -> None:
+        """Queue a sample for writing, called from the event loop."""
+        if metric == SAMPLE_THERMALS:
+            metric, value = SAMPLE_INLET_TEMPERATURE, inlet_temperature(value)
+        if metric not in self._raw or value is None:
+            return
+
+        self._pending.append((metric, value, sampled_at))
+        if self._write_task is None:
+            self._write_task = asyncio.get_running_loop().create_task(self._async_write_pending())
+
+    async def _async_write_pending(self) -> None:
+        """Write the queued samples in order, then call the listeners of the buckets they completed."""
+        try:
+            while self._pending:
+                samples, self._pending = self._pending, []
+                completed = await self._executor.async_submit(PRIORITY_LEGACY, self._write, samples)
+                for metric, mean in completed:
+                    for listener in self.listeners[metric]:
+                        listener(mean)
+        finally:
+            self._write_task = None
+
+    def _write(self, samples: list[tuple[str, float, float]]) -> list[tuple[str, float]]:
+        """Append the samples, and return the mean of every first tier bucket they completed."""
+        completed = []
+        with self._lock:
+            for metric, value, sampled_at in samples:
+                self._raw[metric].append(sampled_at, value)
+                records = [tier.add(sampled_at, value) for _, tier in self._tiers[metric]]
+                if records[0] is not None:
+                    completed.append((metric, records[0][1]))
+        return completed
+
+    def query(self, metric: str, start: float, end: float, resolution: str) -> dict:
+        """Return the records of a metric from start up to end, and their aggregates."""
+        with self._lock:
+            if resolution == RESOLUTION_RAW:
+                points = [{'time': timestamp, 'value': value}
+                          for timestamp, value in self._raw[metric].range(start, end)]
+                count = len(points)
+                total = sum(point['value'] for point in points)
+            else:
+                tier = next(tier for name, tier in self._tiers[metric] if name == resolution)
+                points = [{'time': timestamp, 'mean': mean, 'min': minimum, 'max': maximum, 'count': count}
+                          for timestamp, mean, minimum, maximum, count in tier.ring.range(start, end)]
+                count = sum(point['count'] for point in points)
+                total = sum(point['mean'] * point['count'] for point in points)
+
+        return {
+            'metric': metric,
+            'resolution': resolution,
+            'points': points,
+            'count': count,
+            'mean': total / count if count else None,
+            'min': min((point.get('min', point.get('value')) for point in points), default=None),
+            'max': max((point.get('max', point.get('value')) for point in points), default=None),
+        }
+
+    async def async_close(self) -> None:
+        """Write the queued samples and close the files, before the executor shuts down."""
+        if self._write_task is not None:
+            await asyncio.shield(self._write_task)
+        await self._executor.async_submit(PRIORITY_LEGACY, self.close)
+
+    def close(self) -> None:
+        with self._lock:
+            for metric in TIMESERIES_METRICS:
+                for _, tier in self._tiers[metric]:
+                    tier.flush()
+                    tier.ring.close()
+                self._raw[metric].close()
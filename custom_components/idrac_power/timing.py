@@ -0,0 +1,49 @@
+"""Timing of the setup phases of a config entry, reported in the diagnostics."""
+from __future__ import annotations
+
+import functools
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, DATA_SETUP_TIMINGS
+
+
+class SetupTimings:
+    """How long each phase of an entry's setup took, in the order they finished."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.monotonic() - start, 4)
+
+    def as_dict(self) -> dict:
+        return {
+            'phases': dict(self.phases),
+            'since_start': round(time.monotonic() - self.started, 4),
+        }
+
+
+def timed_platform_setup(platform: str):
+    """Record how long a platform's async_setup_entry takes, as the platform_<name> phase."""
+
+    def decorator(async_setup_entry):
+        @functools.wraps(async_setup_entry)
+        async def wrapper(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
+            timings: SetupTimings = hass.data[DOMAIN][entry.entry_id][DATA_SETUP_TIMINGS]
+            with timings.phase(f"platform_{platform}"):
+                return await async_setup_entry(hass, entry, async_add_entities)
+
+        return wrapper
+
+    return decorator